@@ -5,16 +5,23 @@ from django.conf import settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'game_service.settings')
 
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ProtocolTypeRouter, URLRouter, ChannelNameRouter
 
 django_asgi_app = get_asgi_application()
 
 from .routing import websocket_urlpatterns
 from .middleware import JWTAuthMiddleware
+from .consumers import GameWorkerConsumer
+from .utils import GameManager
 
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
     'websocket': JWTAuthMiddleware(
         URLRouter(websocket_urlpatterns)
     ),
+    # Game workers, started with `manage.py runworker game-worker-<i>`
+    'channel': ChannelNameRouter({
+        channel: GameWorkerConsumer.as_asgi()
+        for channel in GameManager.get_worker_channels()
+    }),
 })
@@ -1,3 +1,4 @@
 from .game import GameConsumer
 from .matchmaking import MatchmakingConsumer
-from .tournament import TournamentConsumer
\ No newline at end of file
+from .tournament import TournamentConsumer
+from .worker import GameWorkerConsumer
\ No newline at end of file
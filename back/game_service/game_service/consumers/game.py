@@ -15,26 +15,38 @@ from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from collections import deque
 
-from game_service.utils import GameManager, create_jwt
+from game_service.utils import GameManager, Outbox
+from game_service.utils.defines import *
 from game_service.models import GameModel
+from .handlers import GameHandlers
+from .worker import GameNode
 
 logger = logging.getLogger(__name__)
 
-class GameConsumer(AsyncJsonWebsocketConsumer):
+class GameConsumer(GameHandlers, AsyncJsonWebsocketConsumer):
 	async def connect(self):
 		self.user_id = self.scope.get('user_id')
 		logger.info(f'user {self.user_id} connected to Game WebSocket')
 
+		self.init_handlers()
+		self.outbox = Outbox(self.send)
+
 		self.game_mode = self.scope['url_route']['kwargs']['game_mode']
 		self.game_id = self.scope['url_route']['kwargs']['game_id'] if self.game_mode == 'remote' else '0'
 
+		# Channel the client messages are relayed to, None when the game runs
+		# in this process, and the node owning the game (None until known)
+		self.worker = None
+		self.owner = None
+		self.pending_messages = []
+		self.ready_data = None
+		self.watching = False
+
 		if self.game_mode != 'remote' and self.game_mode != 'local':
 			logger.error(f'Wrong game mode, must be local or remote')
 			await self.close()
 
 		if self.user_id:
-			self.game_manager = GameManager()
-
 			if self.game_mode == 'remote':
 				try:
 					game = await database_sync_to_async(
@@ -55,23 +67,16 @@ class GameConsumer(AsyncJsonWebsocketConsumer):
 					await self.close()
 					return
 
-				self.game = self.game_manager.get_game(self.game_id)
-				if not self.game:
-					self.game = self.game_manager.create_game(self.game_id)
-				
-				if self.game.status == 'finished':
-					await self.close(4000)
-
 				await self.channel_layer.group_add(
 					f'game_{self.game_id}',
 					self.channel_name
 				)
-			
-			elif self.game_mode == 'local':
-				self.game = self.game_manager.create_game()
-				self.game.add_user()
-				
-			self.game.add_user(self)
+
+				# Failover, see GameManager.watch_owners
+				GameManager().watch_owner(self.game_id, self)
+				self.watching = True
+
+			await self.join()
 			await self.accept()
 
 		else:
@@ -79,6 +84,17 @@ class GameConsumer(AsyncJsonWebsocketConsumer):
 
 
 	async def disconnect(self, close_code):
+		self.outbox.close()
+
+		if self.game is not None:
+			self.game.remove_user(self)
+
+		if self.watching:
+			GameManager().unwatch_owner(self.game_id, self)
+
+		if self.user_id and self.worker is not None:
+			await self.send_to_worker('game.leave')
+
 		if self.user_id and self.game_mode == 'remote':
 			await self.channel_layer.group_discard(
 				f'game_{self.game_id}',
@@ -86,119 +102,122 @@ class GameConsumer(AsyncJsonWebsocketConsumer):
 			)
 
 
-	async def receive(self, text_data):
+	async def receive(self, text_data=None, bytes_data=None):
 		try:
-			data = json.loads(text_data)
-			logger.info(f'data received: {data}')
-			
-			message_type = data.get('type')
-
-			if message_type == 'ready':
-				await self.handle_user_ready(data)
-			elif message_type == 'update':
-				await self.handle_user_update(data)
-			elif message_type == 'quit':
-				await self.handle_user_quit(self.user_id)
-			elif message_type == 'pause':
-				await self.handle_pause(self.user_id)
-			elif message_type == 'unpause':
-				await self.handle_unpause(self.user_id)
+			if bytes_data is not None:
+				# Compact input, the bulk of the inbound messages
+				if self.worker is None:
+					self.handle_input_frame(bytes_data)
+					return
+				data = bytes_data
+			else:
+				data = json.loads(text_data)
+				if data.get('type') == 'ready':
+					self.ready_data = data
+
+			if self.worker is None:
+				await self.handle_message(data)
+			elif self.owner is None:
+				# Until the node running the game is known
+				self.pending_messages.append(data)
+			else:
+				await self.send_to_worker('game.message', data=data)
 
 		except Exception as e:
-			logger.error(f'error: {e}')
+			logger.error(f'error while handling a message of user {self.user_id}: {e}')
 
 
-	async def handle_user_ready(self, data):
-		if self.game_mode == 'remote':
+	async def join(self):
+		''' Join the game in this process, or on the node running it. '''
+		manager = GameManager()
 
-			users_key = f'game:{self.game_id}:users'
-			users = cache.get(users_key, [])
-
-			if self.user_id not in users:
-				users.append(self.user_id)
-				cache.set(users_key, users, timeout=None)
+		if GameManager.get_worker_channels():
+			# The game worker of the shard, unless a node already owns the game
+			self.owner = await manager.get_owner(self.game_id) if self.game_mode == 'remote' else None
+			self.worker = self.owner or GameManager.get_worker_channel(
+				self.game_id if self.game_mode == 'remote' else self.channel_name
+			)
 
-			lock_key = f'game:{self.game_id}:lock'
-			lock = cache.add(lock_key, str(uuid.uuid4()), timeout=60)
+		elif self.game_mode == 'remote':
+			node = GameNode()
+			await node.start()
+			self.owner = await manager.claim_game(self.game_id)
+			self.worker = self.owner if self.owner != node.channel else None
 
-			if lock:
-				try:
-					if self.game.status == 'waiting' and len(users) >= 2:
-						await self.start_game()
-				finally:
-					cache.delete(lock_key)
+		if self.worker is not None:
+			await self.send_to_worker('game.join')
+		else:
+			await self.join_game()
 
-		elif self.game_mode == 'local':
-			await self.start_game()
 
+	async def rejoin(self):
+		''' The node running the game changed, join it on the new one. '''
+		game = await database_sync_to_async(
+			GameModel.objects.get
+		)(id=self.game_id)
 
-	async def send_users_info(self):
-		users_key = f'game:{self.game_id}:users'
-		users = cache.get(users_key, [])
+		if game.status == 'finished':
+			self.owner = None
+			return
 
-		logger.info(f'users: {users}')
+		logger.info(f'owner of game {self.game_id} changed, joining again')
 
-		users_data = []
-		for user in users:
-			user_info = await self.get_user(user)
-			users_data.append(user_info)
+		if self.worker is not None:
+			await self.send_to_worker('game.leave')
+		elif self.game is not None:
+			self.game.remove_user(self)
 
-		await self.channel_layer.group_send(
-			f'game_{self.game_id}',
-			{
-				'type': 'users_info',
-				'users': users_data
-			}
-		)
+		self.init_handlers()
+		await self.join()
 
-	async def users_info(self, event):
-		await self.send_json(event)
+		if self.ready_data is not None:
+			if self.worker is None:
+				await self.handle_message(self.ready_data)
+			elif self.owner is None:
+				self.pending_messages.append(self.ready_data)
+			else:
+				await self.send_to_worker('game.message', data=self.ready_data)
 
 
-	async def get_user(self, user_id):
-		try:
-			async with httpx.AsyncClient() as client:
-				token = create_jwt(self.user_id, timedelta(minutes=2))
-				headers = {
-					'Authorization': f'Bearer {token}'
-				}
+	async def owner_lost(self):
+		await self.rejoin()
 
-				response = await client.get(f"http://user-service:8000/api/users/{user_id}/", headers=headers)
-				if response.status_code == 200:
-					data = response.json()  # or use a custom user serializer
-					return data.get('user')
-				else:
-					return None
-		except httpx.RequestError as e:
-			raise Exception(f"Error querying the user service: {str(e)}")
 
+	async def send_to_worker(self, message_type, **kwargs):
+		await self.channel_layer.send(self.worker, {
+			'type': message_type,
+			'reply_channel': self.channel_name,
+			'user_id': self.user_id,
+			'game_mode': self.game_mode,
+			'game_id': self.game_id,
+			**kwargs
+		})
 
-	async def start_game(self):
-		await self.send_users_info()
-		asyncio.create_task(self.game.start())
 
+	async def game_owner(self, event):
+		''' The node running the game joined, talk to it directly. '''
+		self.worker = self.owner = event['channel']
 
-	async def handle_user_update(self, data):
-		user_id = data.get('user_id')
-		movement = data.get('movement')
+		pending_messages, self.pending_messages = self.pending_messages, []
+		for data in pending_messages:
+			await self.send_to_worker('game.message', data=data)
 
-		self.game.update_user(user_id, movement)
 
+	async def game_frame(self, event):
+		''' Frame sent by the node running the game. '''
+		self.outbox.put(text_data=event.get('text_data'), bytes_data=event.get('bytes_data'))
 
-	async def handle_user_quit(self, user_id):
-		await self.game.quit(user_id)
 
-		# Remove the other user from game if in local mode
-		if self.game_mode == 'local':
-			await self.game.quit(0)
+	async def game_close(self, event):
+		await self.close(event.get('code'))
 
 
-	async def handle_pause(self, user_id):
-		await self.game.pause(user_id)
+	async def game_rejoin(self, event):
+		await self.rejoin()
 
 
-	async def handle_unpause(self, user_id):
-		await self.game.unpause(user_id)
+	async def users_info(self, event):
+		await self.send_json(event)
 
 
 	async def send_error(self, message):
@@ -0,0 +1,241 @@
+import logging
+import json
+import asyncio
+import uuid
+import httpx
+
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from game_service.utils import GameManager, DeltaEncoder, create_jwt
+from game_service.utils.frames import INPUT_STRUCT, FRAME_TYPE_INPUT, INPUT_MOVEMENTS
+
+logger = logging.getLogger(__name__)
+
+class GameHandlers:
+	'''
+	Game side of a player connection: joins the game and handles the
+	messages of the client.
+
+	Used by GameConsumer when the game runs in its process, and by the game
+	node sessions (see worker.py) when it runs in a game worker or on the
+	node owning the game. Needs user_id, game_mode, game_id, channel_layer,
+	an outbox, an async close(code) and an async owner_lost().
+	'''
+
+	def init_handlers(self):
+		# Frames are sent as full json states unless the client asks for
+		# 'delta' json frames or packed 'binary' frames in its ready message
+		self.protocol = 'json'
+		self.delta_encoder = None
+		self.game = None
+
+
+	async def join_game(self):
+		self.game_manager = GameManager()
+
+		if self.game_mode == 'remote':
+			self.game = self.game_manager.get_game(self.game_id)
+			if not self.game:
+				self.game = self.game_manager.create_game(self.game_id)
+
+			if self.game.status == 'finished':
+				await self.close(4000)
+
+		elif self.game_mode == 'local':
+			self.game = self.game_manager.create_game()
+			self.game.add_user()
+
+		self.game.add_user(self)
+
+
+	async def handle_message(self, data):
+		''' A json message, or the bytes of a compact input. '''
+		if isinstance(data, bytes):
+			self.handle_input_frame(data)
+			return
+
+		handler = self.MESSAGE_HANDLERS.get(data.get('type'))
+		if handler is None:
+			return
+
+		# The async handlers return a coroutine, the others None
+		result = handler(self, data)
+		if result is not None:
+			await result
+
+
+	def handle_input_frame(self, data):
+		''' Compact input, see INPUT_STRUCT in utils/frames.py. '''
+		if len(data) != INPUT_STRUCT.size or data[0] != FRAME_TYPE_INPUT or self.game is None:
+			return
+
+		_, player, movement, seq, tick = INPUT_STRUCT.unpack(data)
+		if movement >= len(INPUT_MOVEMENTS):
+			return
+
+		if player == 0:
+			user_id = self.user_id
+		elif self.game_mode == 'local':
+			user_id = 0  # Second player of the local game
+		else:
+			return
+
+		self.game.queue_input(user_id, seq, INPUT_MOVEMENTS[movement], tick)
+
+
+	async def handle_user_ready(self, data):
+		protocol = data.get('protocol', 'json')
+		if protocol in ('json', 'delta', 'binary'):
+			self.protocol = protocol
+
+		if self.protocol == 'delta':
+			self.delta_encoder = DeltaEncoder()
+
+		if self.game_mode == 'remote':
+
+			users_key = f'game:{self.game_id}:users'
+			users = cache.get(users_key, [])
+
+			if self.user_id not in users:
+				users.append(self.user_id)
+				cache.set(users_key, users, timeout=None)
+
+			lock_key = f'game:{self.game_id}:lock'
+			lock = cache.add(lock_key, str(uuid.uuid4()), timeout=60)
+
+			if lock:
+				try:
+					if self.game.status == 'waiting' and len(users) >= 2:
+						await self.start_game()
+				finally:
+					cache.delete(lock_key)
+
+		elif self.game_mode == 'local':
+			await self.start_game()
+
+
+	async def send_users_info(self):
+		users_key = f'game:{self.game_id}:users'
+		users = cache.get(users_key, [])
+
+		logger.info(f'users: {users}')
+
+		users_data = []
+		for user in users:
+			user_info = await self.get_user(user)
+			users_data.append(user_info)
+
+		await self.channel_layer.group_send(
+			f'game_{self.game_id}',
+			{
+				'type': 'users_info',
+				'users': users_data
+			}
+		)
+
+	async def get_user(self, user_id):
+		try:
+			async with httpx.AsyncClient() as client:
+				token = create_jwt(self.user_id, timedelta(minutes=2))
+				headers = {
+					'Authorization': f'Bearer {token}'
+				}
+
+				response = await client.get(f"http://user-service:8000/api/users/{user_id}/", headers=headers)
+				if response.status_code == 200:
+					data = response.json()  # or use a custom user serializer
+					return data.get('user')
+				else:
+					return None
+		except httpx.RequestError as e:
+			raise Exception(f"Error querying the user service: {str(e)}")
+
+
+	async def start_game(self):
+		try:
+			await self.send_users_info()
+		except Exception as e:
+			# The game does not need the profiles to be played
+			logger.error(f'Cannot send the users info of game {self.game_id}: {e}')
+
+		asyncio.create_task(self.game.start())
+
+
+	def get_input_user_id(self, data):
+		'''
+		Player moved by a json message: the user of the connection, the
+		user_id of the message only picks the second player (0) of a local
+		game.
+		'''
+		if data.get('user_id') == 0 and self.game_mode == 'local':
+			return 0
+		return self.user_id
+
+
+	def handle_user_update(self, data):
+		self.game.update_user(self.get_input_user_id(data), data.get('movement'))
+
+
+	def handle_user_input(self, data):
+		''' {'type': 'input', 'user_id': 1, 'seq': 42, 'tick': 1300, 'movement': 'UP'} '''
+		user_id = self.get_input_user_id(data)
+		seq = int(data['seq'])
+		# Clients not sending their tick get no coalescing
+		tick = int(data['tick']) if data.get('tick') is not None else None
+		movement = data.get('movement')
+
+		self.game.queue_input(user_id, seq, movement, tick)
+
+
+	def handle_ack(self, data):
+		if self.delta_encoder is not None:
+			self.delta_encoder.ack(data.get('seq'))
+
+
+	def queue_snapshot(self, snapshot, side):
+		if self.protocol == 'delta':
+			# Deltas depend on what this client acknowledged
+			state = snapshot.state(side)
+			frame = self.delta_encoder.encode(state, snapshot.time) if state is not None else None
+			if frame is not None:
+				self.outbox.put(text_data=json.dumps(frame))
+			return
+
+		payload = snapshot.payload(side, self.protocol)
+		if payload is None:
+			return
+
+		if self.protocol == 'binary':
+			self.outbox.put(bytes_data=payload)
+		else:
+			self.outbox.put(text_data=payload)
+
+
+	async def handle_user_quit(self, user_id):
+		await self.game.quit(user_id)
+
+		# Remove the other user from game if in local mode
+		if self.game_mode == 'local':
+			await self.game.quit(0)
+
+
+	async def handle_pause(self, user_id):
+		await self.game.pause(user_id)
+
+
+	async def handle_unpause(self, user_id):
+		await self.game.unpause(user_id)
+
+
+	# Message type -> handler(self, data)
+	MESSAGE_HANDLERS = {
+		'ready': handle_user_ready,
+		'input': handle_user_input,
+		'update': handle_user_update,
+		'quit': lambda self, data: self.handle_user_quit(self.user_id),
+		'pause': lambda self, data: self.handle_pause(self.user_id),
+		'unpause': lambda self, data: self.handle_unpause(self.user_id),
+		'ack': handle_ack,
+	}
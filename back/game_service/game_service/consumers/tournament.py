@@ -65,6 +65,9 @@ class TournamentConsumer(AsyncJsonWebsocketConsumer):
 
 
 	async def disconnect(self, close_code):
+		if getattr(self, 'tournament', None) is not None:
+			self.tournament.remove_consumer(self)
+
 		if self.user_id:
 			await self.channel_layer.group_discard(
 				f'tournament_{self.tournament_id}',
@@ -0,0 +1,182 @@
+import logging
+import asyncio
+
+from channels.consumer import AsyncConsumer
+from channels.layers import get_channel_layer
+
+from game_service.utils import GameManager, Outbox
+from .handlers import GameHandlers
+
+logger = logging.getLogger(__name__)
+
+class GameWorkerSession(GameHandlers):
+	'''
+	Player connection seen from the game node running its game, the frames
+	are sent to the channel of the GameConsumer holding the WebSocket.
+	'''
+
+	def __init__(self, channel_layer, reply_channel, user_id, game_mode, game_id):
+		self.channel_layer = channel_layer
+		self.reply_channel = reply_channel
+		self.user_id = user_id
+		self.game_mode = game_mode
+		self.game_id = game_id
+
+		self.init_handlers()
+		self.outbox = Outbox(self.send)
+
+
+	async def send(self, text_data=None, bytes_data=None):
+		await self.channel_layer.send(self.reply_channel, {
+			'type': 'game.frame',
+			'text_data': text_data,
+			'bytes_data': bytes_data
+		})
+
+
+	async def close(self, code=None):
+		await self.channel_layer.send(self.reply_channel, {
+			'type': 'game.close',
+			'code': code
+		})
+
+
+	async def owner_lost(self):
+		self.outbox.close()
+		await self.channel_layer.send(self.reply_channel, {
+			'type': 'game.rejoin'
+		})
+
+
+	async def start_game(self):
+		# Fetching the users info must not hold the messages of the other
+		# games of the node
+		asyncio.create_task(super().start_game())
+
+
+class GameNode:
+	'''
+	Game hosting side of the process, listening to a process specific
+	channel of the channel layer.
+
+	The GameConsumer of a player connection whose game runs on this node
+	(the node owns the game lease, or the process is the game worker of
+	its shard) relays its client messages here: game.join, game.message
+	and game.leave. On join the node tells the consumer its channel with
+	game.owner, so the next messages come straight to it.
+	'''
+
+	_instance = None
+
+	def __new__(cls, *args, **kwargs):
+		if not cls._instance:
+			cls._instance = super(GameNode, cls).__new__(cls, *args, **kwargs)
+			cls._instance.channel_layer = None
+			cls._instance.channel = None
+			cls._instance.task = None
+			cls._instance.sessions = {}  # reply channel -> GameWorkerSession
+		return cls._instance
+
+
+	async def start(self):
+		if self.channel is not None:
+			return
+
+		self.channel_layer = get_channel_layer()
+		self.channel = await self.channel_layer.new_channel('game-node.')
+		GameManager().node_channel = self.channel
+		self.task = asyncio.create_task(self.listen())
+
+		logger.info(f'game node listening on {self.channel}')
+
+
+	async def listen(self):
+		handlers = {
+			'game.join': self.join,
+			'game.message': self.message,
+			'game.leave': self.leave,
+		}
+
+		while True:
+			event = await self.channel_layer.receive(self.channel)
+			handler = handlers.get(event.get('type'))
+			if handler is None:
+				continue
+
+			try:
+				await handler(event)
+			except Exception as e:
+				logger.error(f'error while handling {event["type"]}: {e}')
+
+
+	async def join(self, event):
+		await self.start()
+
+		if event['game_mode'] == 'remote':
+			owner = await GameManager().claim_game(event['game_id'])
+			if owner != self.channel:
+				# Another node owns the game
+				await self.channel_layer.send(owner, event)
+				return
+
+		session = GameWorkerSession(
+			self.channel_layer,
+			event['reply_channel'],
+			event['user_id'],
+			event['game_mode'],
+			event['game_id']
+		)
+
+		previous = self.sessions.get(session.reply_channel)
+		if previous is not None:
+			previous.outbox.close()
+			if previous.game is not None:
+				previous.game.remove_user(previous)
+		self.sessions[session.reply_channel] = session
+
+		try:
+			await session.join_game()
+		except Exception as e:
+			logger.error(f'error while joining game {session.game_id}: {e}')
+			return
+
+		await self.channel_layer.send(session.reply_channel, {
+			'type': 'game.owner',
+			'channel': self.channel
+		})
+
+
+	async def message(self, event):
+		session = self.sessions.get(event['reply_channel'])
+		if session is not None:
+			await session.handle_message(event['data'])
+
+
+	async def leave(self, event):
+		session = self.sessions.pop(event['reply_channel'], None)
+		if session is None:
+			return
+
+		session.outbox.close()
+		if session.game is not None:
+			session.game.remove_user(session)
+
+
+class GameWorkerConsumer(AsyncConsumer):
+	'''
+	Entry point of a game worker, run by `manage.py runworker
+	game-worker-<i>` (see GameManager.get_worker_channel). The first message
+	of a player connection comes through the shard channel, the node of the
+	worker then answers with its own channel.
+	'''
+
+	async def game_join(self, event):
+		await GameNode().join(event)
+
+
+	async def game_message(self, event):
+		await GameNode().message(event)
+
+
+	async def game_leave(self, event):
+		await GameNode().leave(event)
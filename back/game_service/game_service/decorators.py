@@ -1,7 +1,9 @@
 import jwt
 import logging
+import asyncio
 
 from django.conf import settings
+from django.http import JsonResponse
 from channels.db import database_sync_to_async
 from channels.exceptions import DenyConnection
 
@@ -10,34 +12,69 @@ from urllib.parse import parse_qs
 
 logger = logging.getLogger(__name__)
 
-def jwt_required(func):
-	@wraps(func)
-	def _wrapped_view(request, *args, **kwargs):
-		try:
-			token = None
-			
-			header = request.headers.get('Authorization')
-			if header and header.startswith('Bearer '):
-				token = header.split(' ')[1]
-			
-			else:
-				token = request.COOKIES.get('access_token')
-			
-			if not token:
-				return JsonResponse({'error': 'Authorization required'}, status=401)
-
-			payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-			request.user_id = payload.get('user_id')
+def authenticate(request):
+	''' Set the user of the request from its token, or the error response. '''
+	try:
+		token = None
+		
+		header = request.headers.get('Authorization')
+		if header and header.startswith('Bearer '):
+			token = header.split(' ')[1]
 		
-		except jwt.ExpiredSignatureError:
-			return JsonResponse({'error': 'Token has expired'}, status=401)
+		else:
+			token = request.COOKIES.get('access_token')
 		
-		except jwt.InvalidTokenError:
-			return JsonResponse({'error': 'Invalid token'}, status=401)
+		if not token:
+			return JsonResponse({'error': 'Authorization required'}, status=401)
+
+		payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+		request.user_id = payload.get('user_id')
+	
+	except jwt.ExpiredSignatureError:
+		return JsonResponse({'error': 'Token has expired'}, status=401)
+	
+	except jwt.InvalidTokenError:
+		return JsonResponse({'error': 'Invalid token'}, status=401)
+
+	except Exception as e:
+		return JsonResponse({'error': f'Error when verifying the token, {str(e)}'}, status=401)
+
+	return None
+
 
-		except Exception as e:
-			return JsonResponse({'error': f'Error when verifying the token, {str(e)}'}, status=401)
+def jwt_required(func):
+	# Async views, their error responses must be awaitable too
+	if asyncio.iscoroutinefunction(func):
+		@wraps(func)
+		async def _wrapped_async_view(request, *args, **kwargs):
+			error = authenticate(request)
+			if error is not None:
+				return error
+			return await func(request, *args, **kwargs)
+
+		return _wrapped_async_view
 
+	@wraps(func)
+	def _wrapped_view(request, *args, **kwargs):
+		error = authenticate(request)
+		if error is not None:
+			return error
 		return func(request, *args, **kwargs)
 
 	return _wrapped_view
+
+
+def async_jwt_view(cls):
+	'''
+	jwt_required for a class based view with async handlers, around the
+	whole view since method_decorator wraps them in sync functions.
+	'''
+	as_view = cls.as_view
+
+	@classmethod
+	@wraps(as_view.__func__)
+	def _as_view(view_cls, **initkwargs):
+		return jwt_required(as_view.__func__(view_cls, **initkwargs))
+
+	cls.as_view = _as_view
+	return cls
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+
+from collections import deque
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from game_service.utils import Game, DeltaEncoder
+from game_service.utils.defines import *
+from game_service.utils.frames import pack_state
+from game_service.utils.Snapshot import Snapshot
+
+class Command(BaseCommand):
+	help = 'Compare the bandwidth and CPU cost of full json, delta and binary frames'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--seconds', type=int, default=60, help='Game time to simulate')
+		parser.add_argument('--ack-lag', type=int, default=3, help='Frames before the client acknowledges a frame')
+
+
+	def handle(self, *args, **options):
+		asyncio.run(self.run(options['seconds'], options['ack_lag']))
+
+
+	async def run(self, seconds, ack_lag):
+		states = self.simulate(seconds * BROADCAST_RATE)
+
+		start = time.perf_counter()
+		full_bytes = sum(len(json.dumps(dict(state, time=now))) for state, now in states)
+		full_time = time.perf_counter() - start
+
+		encoder = DeltaEncoder()
+		pending = deque()
+		delta_bytes = 0
+		delta_frames = 0
+
+		start = time.perf_counter()
+		for state, now in states:
+			frame = encoder.encode(state, now)
+			if frame is not None:
+				delta_bytes += len(json.dumps(frame))
+				delta_frames += 1
+				pending.append(frame['seq'])
+
+			if len(pending) > ack_lag:
+				encoder.ack(pending.popleft())
+		delta_time = time.perf_counter() - start
+
+		start = time.perf_counter()
+		binary_bytes = sum(len(pack_state(dict(state, time=now))) for state, now in states)
+		binary_time = time.perf_counter() - start
+
+		frames = len(states)
+		self.stdout.write(f'{frames} frames at {BROADCAST_RATE} Hz (countdown included), client ack lag of {ack_lag} frames')
+		self.stdout.write(f'full json: {full_bytes / seconds / 1024:8.2f} KiB/s  {full_time / frames * 1e6:6.2f} us/frame')
+		self.stdout.write(f'delta:     {delta_bytes / seconds / 1024:8.2f} KiB/s  {delta_time / frames * 1e6:6.2f} us/frame  ({delta_frames} frames sent)')
+		self.stdout.write(f'binary:    {binary_bytes / seconds / 1024:8.2f} KiB/s  {binary_time / frames * 1e6:6.2f} us/frame')
+
+
+	def simulate(self, frames):
+		'''
+		(state, time) of the frames of a game with paddles that move a quarter
+		of the time, after the countdown whose frames only change once a sec.
+		'''
+		game = Game(1)
+		game.add_user(SimpleNamespace(user_id=1))
+		game.add_user(SimpleNamespace(user_id=2))
+		first, second = game.users.values()
+
+		states = []
+		game.status = 'ready'
+		game.timers.schedule(TICK_RATE, game.count_down)
+		while game.status == 'ready':
+			for _ in range(TICK_RATE // BROADCAST_RATE):
+				game.tick()
+			snapshot = Snapshot(game)
+			states.append((snapshot.state('right'), snapshot.time))
+
+		for i in range(frames):
+			first.movement = ('UP', 'NONE', 'DOWN', 'NONE', 'NONE', 'NONE', 'NONE', 'NONE')[(i // 15) % 8]
+			second.movement = ('NONE', 'NONE', 'NONE', 'DOWN', 'NONE', 'UP', 'NONE', 'NONE')[(i // 20) % 8]
+
+			for _ in range(TICK_RATE // BROADCAST_RATE):
+				game.tick()
+				if game.status == 'finished':
+					game.status = 'started'
+					first.score = second.score = 0
+
+			snapshot = Snapshot(game)
+			states.append((snapshot.state('right'), snapshot.time))
+
+		return states
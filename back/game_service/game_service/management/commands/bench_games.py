@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from game_service.utils.BatchEngine import BatchEngine
+from game_service.utils.HeadlessRunner import HeadlessRunner
+from game_service.utils.defines import *
+
+class Command(BaseCommand):
+	help = 'Throughput of the game engine for a number of concurrent headless games'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--games', default='1,100,1000,10000', help='comma separated game counts')
+		parser.add_argument('--ticks', type=int, default=600)
+		parser.add_argument('--engine', choices=('python', 'numpy'), default='numpy' if BatchEngine.available else 'python')
+		parser.add_argument('--seed', type=int, default=0)
+		parser.add_argument('--miss', type=float, default=0.2, help='share of the balls the scripted players let through')
+		parser.add_argument('--score', type=int, default=POINTS_TO_WIN - 1, help='points of each player when a game starts, the next point ends the game')
+		parser.add_argument('--min-tps', type=float, default=None, help='fail when the game ticks/s of the largest run is lower')
+
+
+	def handle(self, *args, **options):
+		if options['engine'] == 'numpy' and not BatchEngine.available:
+			raise CommandError('numpy is not installed')
+
+		counts = [int(count) for count in options['games'].split(',')]
+		ticks = options['ticks']
+
+		self.stdout.write(f'{options["engine"]} engine, {ticks} ticks, {TICK_RATE} Hz tick budget {1000 / TICK_RATE:.2f} ms')
+		self.stdout.write(
+			f'{"games":>7} {"ticks/s":>12} {"mean ms":>9} {"p99 ms":>9} {"us/game":>9} '
+			f'{"capacity":>9} {"finished":>9} {"checksum":>21}'
+		)
+
+		for count in counts:
+			engine = BatchEngine() if options['engine'] == 'numpy' else None
+			runner = HeadlessRunner(count, seed=options['seed'], engine=engine, miss=options['miss'], score=options['score'])
+
+			# Warm up, then measure
+			runner.run(min(ticks // 10, 60))
+			durations = sorted(runner.run(ticks))
+
+			total = sum(durations)
+			mean = total / len(durations)
+			p99 = durations[min(int(len(durations) * 0.99), len(durations) - 1)]
+			tps = count * len(durations) / total
+
+			# Games one core can step at TICK_RATE, from the p99 step time
+			capacity = int(count / (p99 * TICK_RATE))
+
+			self.stdout.write(
+				f'{count:>7} {tps:>12.0f} {mean * 1000:>9.3f} {p99 * 1000:>9.3f} '
+				f'{mean / count * 1e6:>9.2f} {capacity:>9} {runner.finished:>9} {runner.checksum():>21}'
+			)
+
+		if options['min_tps'] is not None and tps < options['min_tps']:
+			raise CommandError(f'{tps:.0f} game ticks/s with {count} games, below {options["min_tps"]:.0f}')
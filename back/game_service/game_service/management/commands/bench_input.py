@@ -0,0 +1,86 @@
+import asyncio
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from game_service.consumers import GameConsumer
+from game_service.utils import Game
+from game_service.utils.frames import pack_input
+from game_service.utils.defines import *
+
+MOVEMENTS = ('UP', 'NONE', 'DOWN', 'NONE')
+
+def json_input(user_id, seq, tick):
+	return {'text_data': json.dumps({
+		'type': 'input',
+		'user_id': user_id,
+		'seq': seq,
+		'tick': tick,
+		'movement': MOVEMENTS[seq % len(MOVEMENTS)]
+	})}
+
+
+def binary_input(user_id, seq, tick):
+	return {'bytes_data': pack_input(0, MOVEMENTS[seq % len(MOVEMENTS)], seq, tick)}
+
+
+class Command(BaseCommand):
+	help = 'Paddle inputs handled per second and per core by GameConsumer.receive, for each input format'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--messages', type=int, default=200000)
+		parser.add_argument('--per-tick', type=int, default=2, help='inputs sent in the same client tick, coalesced by the server')
+		parser.add_argument('--per-step', type=int, default=4, help='inputs received between two physics steps, applied together')
+		parser.add_argument('--repeat', type=int, default=3)
+
+
+	def handle(self, *args, **options):
+		asyncio.run(self.run(options['messages'], options['per_tick'], options['per_step'], options['repeat']))
+
+
+	def create_consumer(self):
+		''' Consumer of a started game in this process, without a socket. '''
+		consumer = GameConsumer()
+		consumer.user_id = 1
+		consumer.game_mode = 'remote'
+		consumer.game_id = 1
+		consumer.worker = None
+		consumer.owner = None
+		consumer.pending_messages = []
+		consumer.ready_data = None
+		consumer.init_handlers()
+
+		consumer.game = Game(1)
+		consumer.game.add_user(user_id=1)
+		consumer.game.add_user(user_id=2)
+		consumer.game.status = 'started'
+		return consumer
+
+
+	async def run(self, count, per_tick, per_step, repeat):
+		self.stdout.write(f'{"format":>8} {"bytes":>6} {"msg/s":>10} {"us/msg":>8} {"coalesced":>10} {"dropped":>8}')
+
+		for name, encode in (('json', json_input), ('binary', binary_input)):
+			messages = [encode(1, seq, seq // per_tick) for seq in range(1, count + 1)]
+			size = len(next(iter(messages[0].values())))
+
+			best = None
+			for _ in range(repeat):
+				consumer = self.create_consumer()
+				player = consumer.game.users[1]
+
+				start = time.perf_counter()
+				for index, message in enumerate(messages, 1):
+					await consumer.receive(**message)
+					if index % per_step == 0 and player.inputs:
+						player.apply_input()
+				duration = time.perf_counter() - start
+
+				if best is None or duration < best:
+					best = duration
+
+			self.stdout.write(
+				f'{name:>8} {size:>6} {count / best:>10.0f} {best / count * 1e6:>8.2f} '
+				f'{player.coalesced_inputs:>10} {player.dropped_inputs:>8}'
+			)
@@ -0,0 +1,133 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django_redis import get_redis_connection
+
+from game_service.models import RatingModel
+from game_service.utils import MatchmakingQueue
+from game_service.utils.defines import *
+
+def percentile(values, q):
+	if not values:
+		return float('nan')
+	values = sorted(values)
+	return values[min(int(len(values) * q), len(values) - 1)]
+
+
+class Command(BaseCommand):
+	help = 'Simulated matchmaking passes over a Redis queue: rating gap of the matches against the wait, for several window growths'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--users', type=int, default=10000, help='users already queued at the start')
+		parser.add_argument('--arrivals', type=int, default=20, help='users joining per simulated sec')
+		parser.add_argument('--seconds', type=int, default=60, help='simulated sec')
+		parser.add_argument('--interval', type=float, default=MATCH_INTERVAL, help='simulated sec between two passes')
+		parser.add_argument('--spread', type=float, default=300, help='standard deviation of the ratings')
+		parser.add_argument('--outliers', type=int, default=4, help='users joining after 1 sec with a rating out of reach of the window')
+		parser.add_argument('--growth', default='0,5,10,20', help='rating window growths per sec to compare')
+		parser.add_argument('--seed', type=int, default=42)
+
+
+	def handle(self, *args, **options):
+		growths = [float(growth) for growth in options['growth'].split(',')]
+
+		# The backlog users are matched among themselves by the first pass,
+		# the later arrivals show the wait the window growth trades for gaps.
+		# The outliers are only matched once they waited MATCH_MAX_WAIT.
+		self.stdout.write(
+			f'{"":>7} {"":>6} {"backlog":>8} {"arrivals":>17} {"":>37} {"outliers":>14}'
+		)
+		self.stdout.write(
+			f'{"growth":>7} {"left":>6} {"gap p95":>8} {"gap p50":>8} {"gap p95":>8} '
+			f'{"wait avg":>9} {"wait p95":>9} {"1st pass":>9} {"pass":>7} {"matched":>8} {"wait":>5}'
+		)
+
+		backlog, arrivals = self.fifo_gaps(options)
+		self.stdout.write(
+			f'{"fifo":>7} {0:>6} {percentile(backlog, 0.95):>8.1f} {percentile(arrivals, 0.5):>8.1f} '
+			f'{percentile(arrivals, 0.95):>8.1f} {0:>9.1f} {0:>9.1f} {"-":>9} {"-":>7} {"-":>8} {"-":>5}'
+		)
+
+		for growth in growths:
+			self.simulate(growth, options)
+
+
+	def arrivals(self, options):
+		''' (join time in ms, rating) of the simulated users, in join order. '''
+		rng = random.Random(options['seed'])
+		users = [(0, rng.gauss(RatingModel.DEFAULT, options['spread'])) for _ in range(options['users'])]
+
+		# Far past the tails, and further than RATING_WINDOW_MAX apart
+		for index in range(options['outliers']):
+			side = 1 if index % 2 == 0 else -1
+			gap = 5 * options['spread'] + (index // 2 + 1) * 2 * RATING_WINDOW_MAX
+			users.append((1000, RatingModel.DEFAULT + side * gap))
+
+		joins = sorted(
+			rng.randrange(1000, options['seconds'] * 1000)
+			for _ in range(options['arrivals'] * (options['seconds'] - 1))
+		)
+		users += [(joined, rng.gauss(RatingModel.DEFAULT, options['spread'])) for joined in joins]
+		return users
+
+
+	def fifo_gaps(self, options):
+		''' Rating gaps of the previous matchmaking, pairing in join order. '''
+		users = self.arrivals(options)
+		gaps = ([], [])
+		for (joined, a), (_, b) in zip(users[0::2], users[1::2]):
+			gaps[joined > 0].append(abs(a - b))
+		return gaps
+
+
+	def simulate(self, growth, options):
+		redis = get_redis_connection('default')
+		name = 'bench'
+		for key in redis.keys(f'matchmaking:{name}:*'):
+			redis.delete(key)
+
+		queue = MatchmakingQueue('game', name=name, window_growth=growth)
+		arrivals = self.arrivals(options)
+		interval = int(options['interval'] * 1000)
+
+		outliers = range(options['users'] + 1, options['users'] + options['outliers'] + 1)  # user ids
+
+		gaps = ([], [])  # of the backlog matches, of the arrival ones
+		waits = []  # of the arrivals
+		outlier_waits = []
+		durations = []  # of the passes, in ms
+		matched = 0
+
+		index = 0
+		for now in range(0, options['seconds'] * 1000, interval):
+			while index < len(arrivals) and arrivals[index][0] <= now:
+				queue.push(index + 1, arrivals[index][1], arrivals[index][0])
+				index += 1
+
+			start = time.perf_counter()
+			matches = queue.match(now)
+			durations.append((time.perf_counter() - start) * 1000)
+
+			for users in matches:
+				ratings = [rating for _, rating in users.values()]
+				arrival = any(joined > 0 for joined, _ in users.values())
+				gaps[arrival].append(max(ratings) - min(ratings))
+
+				for user_id, (joined, _) in users.items():
+					if user_id in outliers:
+						outlier_waits.append((now - joined) / 1000)
+					elif joined > 0:
+						waits.append((now - joined) / 1000)
+				matched += len(users)
+
+		self.stdout.write(
+			f'{growth:>7g} {index - matched:>6} {percentile(gaps[0], 0.95):>8.1f} {percentile(gaps[1], 0.5):>8.1f} '
+			f'{percentile(gaps[1], 0.95):>8.1f} {statistics.fmean(waits) if waits else 0:>9.1f} '
+			f'{percentile(waits, 0.95):>9.1f} {durations[0]:>7.1f}ms {statistics.fmean(durations[1:]):>5.2f}ms '
+			f'{len(outlier_waits):>4}/{len(outliers):<3} {max(outlier_waits, default=0):>5.1f}'
+		)
+
+		for key in redis.keys(f'matchmaking:{name}:*'):
+			redis.delete(key)
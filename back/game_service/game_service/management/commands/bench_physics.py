@@ -0,0 +1,92 @@
+import asyncio
+import time
+import tracemalloc
+
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from game_service.utils import Game
+from game_service.utils.Vector import Vector2
+
+# The command only needs Game and Vector2, so the same file measures an
+# older tree, for instance the allocating physics before Vector2 got
+# __slots__ and in-place operations (the parent of the commit adding this
+# command), from the repository root:
+#
+#   git worktree add /tmp/baseline <commit>^
+#   mkdir -p /tmp/baseline/back/game_service/game_service/management/commands
+#   touch /tmp/baseline/back/game_service/game_service/management/__init__.py \
+#         /tmp/baseline/back/game_service/game_service/management/commands/__init__.py
+#   cp back/game_service/game_service/management/commands/bench_physics.py \
+#      /tmp/baseline/back/game_service/game_service/management/commands/
+#   cd /tmp/baseline/back/game_service && python manage.py bench_physics --ticks 50000
+
+class Command(BaseCommand):
+	help = 'Micro-benchmark of the per tick physics step (time and allocations), see the top of the file to measure an older tree'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--ticks', type=int, default=100000)
+
+
+	def handle(self, *args, **options):
+		asyncio.run(self.run(options['ticks']))
+
+
+	async def run(self, ticks):
+		game = Game(1)
+		game.add_user(SimpleNamespace(user_id=1))
+		game.add_user(SimpleNamespace(user_id=2))
+		game.status = 'started'
+		users = list(game.users.values())
+
+		start = time.perf_counter()
+		self.step(game, users, ticks)
+		elapsed = time.perf_counter() - start
+
+		# Count Vector2 constructions and transient memory in a second pass,
+		# tracemalloc is too slow to be enabled while timing
+		vectors = 0
+		vector_init = Vector2.__init__
+
+		def counting_init(self, x, y):
+			nonlocal vectors
+			vectors += 1
+			vector_init(self, x, y)
+
+		Vector2.__init__ = counting_init
+		tracemalloc.start()
+		try:
+			transient = self.step(game, users, ticks, trace=True)
+		finally:
+			tracemalloc.stop()
+			Vector2.__init__ = vector_init
+
+		self.stdout.write(f'ticks:                  {ticks}')
+		self.stdout.write(f'time per tick:          {elapsed / ticks * 1e6:.2f} us')
+		self.stdout.write(f'Vector2 created / tick: {vectors / ticks:.3f}')
+		self.stdout.write(f'transient bytes / tick: {transient / ticks:.1f}')
+
+
+	def step(self, game, users, ticks, trace=False):
+		transient = 0
+
+		for i in range(ticks):
+			users[0].movement = 'UP' if (i // 50) % 2 else 'DOWN'
+			users[1].movement = 'DOWN' if (i // 70) % 2 else 'UP'
+
+			if trace:
+				before = tracemalloc.get_traced_memory()[0]
+				tracemalloc.reset_peak()
+
+			game.tick()
+
+			if trace:
+				transient += tracemalloc.get_traced_memory()[1] - before
+
+			if game.status == 'finished':
+				game.status = 'started'
+				for user in users:
+					user.score = 0
+
+		return transient
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import math
+import random
+import time
+
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game_service.utils import create_jwt
+from game_service.utils.frames import FRAME_STRUCT, FRAME_TYPE_STATE, STATUS_CODES, pack_input
+from game_service.utils.defines import *
+
+try:
+	from websockets.asyncio.client import connect
+except ImportError:
+	connect = None
+
+STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+class LoadStats:
+	def __init__(self):
+		self.matched = 0
+		self.finished = 0
+		self.frames = 0
+		self.inputs = 0
+		self.intervals = []
+		self.latencies = []
+		self.errors = Counter()
+
+
+class Bot:
+	'''
+	Headless player: waits for an opponent in the matchmaking, joins the
+	game with binary frames and moves its paddle toward the ball. It lets
+	the ball through on a `miss` share of the approaches, so the games end.
+
+	Records the time between two frames of the started game, and the time
+	between an input and the first frame acknowledging it (input_seq).
+	'''
+
+	def __init__(self, user_id, url, stats, timeout, miss):
+		self.user_id = user_id
+		self.url = url
+		self.stats = stats
+		self.timeout = timeout
+		self.miss = miss
+		self.rng = random.Random(user_id)
+		self.headers = {'Cookie': f'access_token={create_jwt(user_id, timedelta(hours=1))}'}
+
+		self.seq = 0
+		self.movement = 'NONE'
+		self.sent = {}  # seq -> send time
+		self.last_frame = None
+		self.ball_x = 0
+		self.approaching = False
+		self.missing = False
+
+
+	async def run(self):
+		try:
+			game_id = await asyncio.wait_for(self.find_game(), self.timeout)
+			self.stats.matched += 1
+			await asyncio.wait_for(self.play(game_id), self.timeout)
+		except Exception as e:
+			self.stats.errors[type(e).__name__] += 1
+
+
+	async def find_game(self):
+		async with connect(f'{self.url}/ws/matchmaking/game/', additional_headers=self.headers) as socket:
+			async for message in socket:
+				data = json.loads(message)
+				if data.get('type') == 'game_found':
+					return data['game_id']
+
+		raise ConnectionError('matchmaking closed')
+
+
+	async def play(self, game_id):
+		async with connect(f'{self.url}/ws/game/remote/{game_id}/', additional_headers=self.headers, max_size=None) as socket:
+			await socket.send(json.dumps({'type': 'ready', 'protocol': 'binary'}))
+
+			async for message in socket:
+				if not isinstance(message, bytes) or message[0] != FRAME_TYPE_STATE:
+					continue
+
+				now = time.perf_counter()
+				frame = FRAME_STRUCT.unpack(message)
+				status = STATUS_NAMES.get(frame[1])
+				self.stats.frames += 1
+
+				if status == 'started':
+					if self.last_frame is not None:
+						self.stats.intervals.append(now - self.last_frame)
+					self.last_frame = now
+
+					self.record_latency(frame[10], now)
+					await self.follow_ball(socket, frame)
+				else:
+					self.last_frame = None
+
+				if status == 'finished':
+					self.stats.finished += 1
+					return
+
+
+	def record_latency(self, input_seq, now):
+		for seq in [seq for seq in self.sent if seq <= input_seq]:
+			self.stats.latencies.append(now - self.sent.pop(seq))
+
+
+	async def follow_ball(self, socket, frame):
+		# The paddle of the player is always on the positive x side
+		ball_x, ball_y = frame[6], frame[7]
+		if ball_x > self.ball_x and not self.approaching:
+			self.missing = self.rng.random() < self.miss
+		self.approaching = ball_x > self.ball_x
+		self.ball_x = ball_x
+
+		offset = ball_y - frame[4]
+		if self.missing:
+			movement = 'NONE'
+		elif offset < -PADDLE_HEIGHT / 4:
+			movement = 'UP'
+		elif offset > PADDLE_HEIGHT / 4:
+			movement = 'DOWN'
+		else:
+			movement = 'NONE'
+
+		if movement == self.movement:
+			return
+
+		self.movement = movement
+		self.seq += 1
+		self.sent[self.seq] = time.perf_counter()
+		self.stats.inputs += 1
+
+		await socket.send(pack_input(0, movement, self.seq, self.stats.frames))
+
+
+def percentiles(values):
+	''' p50, p99 and max in ms. '''
+	if not values:
+		return (math.nan, math.nan, math.nan)
+
+	values = sorted(values)
+	return tuple(
+		values[min(int(len(values) * q), len(values) - 1)] * 1000
+		for q in (0.5, 0.99, 1.0)
+	)
+
+
+class Command(BaseCommand):
+	help = 'Load test of the matchmaking and game WebSockets with bots playing remote games against each other'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--url', default='ws://localhost:8000', help='daphne serving the game service')
+		parser.add_argument('--bots', type=int, default=1000, help='players, paired by the matchmaking')
+		parser.add_argument('--ramp', type=float, default=200, help='new bots per second')
+		parser.add_argument('--first-user-id', type=int, default=1000000)
+		parser.add_argument('--timeout', type=float, default=600, help='sec allowed for the matchmaking and for the game')
+		parser.add_argument('--miss', type=float, default=0.2, help='share of the balls the bots let through')
+
+
+	def handle(self, *args, **options):
+		if connect is None:
+			raise CommandError('the websockets package is not installed')
+
+		if options['bots'] < 2 or options['bots'] % 2:
+			raise CommandError('--bots must be an even number')
+
+		asyncio.run(self.run(options))
+
+
+	async def run(self, options):
+		stats = LoadStats()
+		bots = [
+			Bot(options['first_user_id'] + index, options['url'].rstrip('/'), stats, options['timeout'], options['miss'])
+			for index in range(options['bots'])
+		]
+
+		start = time.perf_counter()
+		tasks = []
+		for bot in bots:
+			tasks.append(asyncio.create_task(bot.run()))
+			await asyncio.sleep(1 / options['ramp'])
+
+		await asyncio.gather(*tasks)
+		duration = time.perf_counter() - start
+
+		interval = percentiles(stats.intervals)
+		latency = percentiles(stats.latencies)
+		jitter = [abs(value - 1 / BROADCAST_RATE) for value in stats.intervals]
+
+		self.stdout.write(
+			f'{len(bots)} bots in {duration:.1f} s, {stats.matched} matched, {stats.finished // 2} games finished, '
+			f'{stats.frames} frames, {stats.inputs} inputs'
+		)
+		self.stdout.write(f'{"ms":<22} {"p50":>8} {"p99":>8} {"max":>8}')
+		self.stdout.write(f'{"frame interval":<22} {interval[0]:>8.2f} {interval[1]:>8.2f} {interval[2]:>8.2f}')
+		self.stdout.write(f'{"jitter":<22} ' + ' '.join(f'{value:>8.2f}' for value in percentiles(jitter)))
+		self.stdout.write(f'{"input to frame":<22} {latency[0]:>8.2f} {latency[1]:>8.2f} {latency[2]:>8.2f}')
+
+		if stats.errors:
+			self.stdout.write(f'errors: {dict(stats.errors)}')
@@ -0,0 +1,94 @@
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from game_service.utils import GameManager
+from game_service.utils.defines import *
+from game_service.utils.metrics import memory_usage
+from game_service.utils.TimerWheel import seconds_to_ticks
+
+class SoakConsumer:
+	def __init__(self, user_id):
+		self.user_id = user_id
+		self.frames = 0
+
+	def queue_snapshot(self, snapshot, side):
+		snapshot.payload(side, 'binary')
+		self.frames += 1
+
+
+class Command(BaseCommand):
+	help = 'Soak test of the game lifecycle, the memory must stay flat as the finished games are evicted'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--games', type=int, default=5000)
+		parser.add_argument('--batch', type=int, default=500)
+		parser.add_argument('--ticks', type=int, default=120)
+		parser.add_argument('--no-evict', action='store_true', help='keep the finished games, to compare')
+
+
+	def handle(self, *args, **options):
+		asyncio.run(self.run(options['games'], options['batch'], options['ticks'], not options['no_evict']))
+
+
+	async def run(self, games, batch, ticks, evict):
+		manager = GameManager()
+		tracemalloc.start()
+
+		self.stdout.write(f'{"games":>7} {"live":>6} {"evicted":>8} {"traced KiB":>11} {"rss MiB":>8}')
+
+		game_id = 0
+		baseline = None
+		while game_id < games:
+			for _ in range(min(batch, games - game_id)):
+				game_id += 1
+				await self.play(manager, game_id, ticks)
+
+			if evict:
+				# As if FINISHED_GRACE went by
+				manager.collect(now=time.monotonic() + FINISHED_GRACE)
+
+			# Let the pending ball serves fire, then measure
+			for _ in range(seconds_to_ticks(BALL_SERVE_DELAY)):
+				manager.scheduler.timers.advance()
+			gc.collect()
+
+			traced, _ = tracemalloc.get_traced_memory()
+			if baseline is None:
+				baseline = traced
+			rss = memory_usage()['rss'] or 0
+
+			self.stdout.write(
+				f'{game_id:>7} {len(manager.games):>6} {manager.evicted:>8} '
+				f'{traced / 1024:>11.1f} {rss / 1024 / 1024:>8.1f}'
+			)
+
+		tracemalloc.stop()
+		growth = (traced - baseline) / 1024
+		self.stdout.write(f'traced memory growth after the first batch: {growth:.1f} KiB')
+
+
+	async def play(self, manager, game_id, ticks):
+		game = manager.create_game(game_id)
+		consumers = [SoakConsumer(1), SoakConsumer(2)]
+		for consumer in consumers:
+			game.add_user(consumer)
+
+		game.status = 'started'
+		for tick in range(ticks):
+			# The games share the timers of the scheduler, as in Scheduler.step
+			manager.scheduler.timers.advance()
+			game.tick()
+			if tick % (TICK_RATE // BROADCAST_RATE) == 0:
+				await game.notify_users()
+
+		# What Game.start does once the game is over, then the players leave
+		game.status = 'finished'
+		await game.notify_users()
+		game.finish()
+
+		for consumer in consumers:
+			game.remove_user(consumer)
@@ -1,2 +1,3 @@
-from .game import ScoreModel, GameModel
-from .tournament import TournamentModel
\ No newline at end of file
+from .game import ScoreModel, GameModel, ReplayModel
+from .tournament import TournamentModel
+from .rating import RatingModel
\ No newline at end of file
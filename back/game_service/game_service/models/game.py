@@ -59,4 +59,13 @@ class ScoreModel(models.Model):
 		return {
 			'user_id': self.user_id,
 			'score': self.score
-		}
\ No newline at end of file
+		}
+
+class ReplayModel(models.Model):
+	game_id = models.IntegerField(unique=True)
+	ticks = models.IntegerField(default=0)
+	data = models.BinaryField()
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	def __str__(self):
+		return f'replay of game {self.game_id}, {self.ticks} ticks in {len(self.data)} bytes'
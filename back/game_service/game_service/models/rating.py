@@ -0,0 +1,24 @@
+from django.db import models
+
+class RatingModel(models.Model):
+	DEFAULT = 1500.0  # Elo rating of a user without any finished game
+
+	user_id = models.IntegerField(unique=True)
+	rating = models.FloatField(default=DEFAULT)
+	games = models.IntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	@staticmethod
+	def rating_of(user_id):
+		rating = RatingModel.objects.filter(user_id=user_id).values_list('rating', flat=True).first()
+		return rating if rating is not None else RatingModel.DEFAULT
+
+	def __str__(self):
+		return f'user_id {self.user_id} rated {self.rating:.0f} after {self.games} games'
+
+	def toJSON(self):
+		return {
+			'user_id': self.user_id,
+			'rating': self.rating,
+			'games': self.games
+		}
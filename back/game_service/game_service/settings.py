@@ -89,7 +89,7 @@ WSGI_APPLICATION = 'game_service.wsgi.application'
 DATABASES = {
 	'default': {
 		'ENGINE': 'django.db.backends.postgresql',
-		'HOST': 'game_db',
+		'HOST': os.environ.get('DB_GAME_HOST', 'game_db'),
 		'PORT': os.environ.get('DB_GAME_PORT'),
 		'NAME': os.environ.get('DB_GAME_NAME'),
 		'USER': os.environ.get('DB_GAME_USER'),
@@ -97,21 +97,40 @@ DATABASES = {
 	}
 }
 
+# Redis of the channel layer, the cache and the game leases
+REDIS_HOST = os.environ.get('REDIS_HOST', 'redis')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',  # Redis backend
         'CONFIG': {
-            "hosts": [('redis', 6379)],  # Point to the correct Redis server
+            "hosts": [(REDIS_HOST, REDIS_PORT)],  # Point to the correct Redis server
 			"capacity": 1000,
 			"expiry": 2,
         },
     },
 }
 
+# Physics engine of the live games, 'numpy' steps all the games of the
+# process together and falls back to 'python' when numpy is not installed
+GAME_ENGINE = os.environ.get('GAME_ENGINE', 'numpy')
+
+# Number of game worker processes (`manage.py runworker game-worker-<i>`)
+# sharing the games by id, 0 runs the games in the daphne process
+GAME_WORKERS = int(os.environ.get('GAME_WORKERS', 0))
+
+# Record the inputs of the remote games, to replay them (ReplayModel)
+GAME_REPLAYS = os.environ.get('GAME_REPLAYS', '1') == '1'
+
+# Per phase timings of the game loop in api/games/metrics/, 'sampled'
+# measures one step out of PROFILE_SAMPLE_INTERVAL, 'full' all, or 'off'
+GAME_PROFILING = os.environ.get('GAME_PROFILING', 'sampled')
+
 CACHES = {
     'default': {
         'BACKEND': 'django_redis.cache.RedisCache',  # Django Redis cache backend
-        'LOCATION': 'redis://redis:6379/1',  # Redis server and DB number
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/1',  # Redis server and DB number
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
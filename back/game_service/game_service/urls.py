@@ -6,6 +6,8 @@ urlpatterns = [
     path('api/games/', GameView.as_view()),
     path('api/games/stats/', GameStatView.as_view()),
     path('api/games/history/', GameHistoryView.as_view()),
+    path('api/games/<int:game_id>/replay/', GameReplayView.as_view()),
+    path('api/games/metrics/', GameMetricsView.as_view()),
     
     path('api/tournaments/<int:tournament_id>', TournamentView.as_view()),
 ]
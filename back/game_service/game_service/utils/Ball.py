@@ -1,31 +1,36 @@
 import random
 import math
 import logging
-import asyncio
 
 from .Player import Player
 from .defines import *
 from .Vector import *
+from .TimerWheel import seconds_to_ticks
 
 class Ball:
-    def __init__(self):
+    def __init__(self, timers, rng=random):
+        self.timers = timers
+        self.rng = rng
         self.position = Vector2(0, 0)
-        self.direction = generate_vector()
+        self.direction = generate_vector(rng)
         self.moving = True
         self.speed = BALL_SPEED
         self.radius = BALL_RADIUS
 
-    async def reset(self, direction):
-        self.position = Vector2(0, 0)
-        self.direction = generate_vector_in_direction(direction)
+    def reset(self, direction):
+        ''' Back to the center, served again after BALL_SERVE_DELAY. '''
+        self.position.set(0, 0)
+        self.direction = generate_vector_in_direction(direction, self.rng)
         self.moving = False
-        await asyncio.sleep(1)
+        self.timers.schedule(seconds_to_ticks(BALL_SERVE_DELAY), self.serve)
+
+    def serve(self):
         self.moving = True
         self.speed = BALL_SPEED
 
     def move(self):
         if self.moving:
-            self.position += self.direction.scale(self.speed)
+            self.position.add_scaled(self.direction, self.speed * TICK_SCALE)
 
     def increase_speed(self):
         self.speed += BALL_SPEED_INCREMENT
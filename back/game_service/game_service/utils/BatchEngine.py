@@ -0,0 +1,266 @@
+import logging
+
+from .defines import *
+
+try:
+	import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+	np = None
+
+logger = logging.getLogger(__name__)
+
+MOVEMENTS = {
+	'UP': -1,
+	'NONE': 0,
+	'DOWN': 1,
+}
+
+PADDLE_MIN_Y: float = -300 + PADDLE_HEIGHT / 2
+PADDLE_MAX_Y: float = 300 - PADDLE_HEIGHT / 2
+
+class BatchEngine:
+	'''
+	Vectorized physics for every started game of the process.
+
+	The ball and paddles of the attached games are stored in struct of
+	arrays NumPy buffers, one slot per game, and advanced together with a
+	single vectorized step. The per game Python objects (Ball, Player) are
+	only written back when a frame is about to be sent, and are read back
+	whenever the Python side takes over (scoring, ball served by its timer).
+
+	Games that are not in the 'started' state (countdown, pause) or that do
+	not have exactly two players keep using Game.tick().
+	'''
+
+	available = np is not None
+
+	def __init__(self, capacity=64):
+		self.capacity = 0
+		self.slots = {}  # game -> slot
+		self.free_slots = []
+
+		# Per slot Python state, read on every step
+		self.players = []  # (player, player)
+		self.moving = []  # ball.moving as last seen by the engine
+
+		self.resize(capacity)
+
+
+	def resize(self, capacity):
+		def grow(array, shape):
+			new = np.zeros(shape, dtype=array.dtype if array is not None else np.float64)
+			if array is not None:
+				new[:len(array)] = array
+			return new
+
+		self.ball_x = grow(getattr(self, 'ball_x', None), capacity)
+		self.ball_y = grow(getattr(self, 'ball_y', None), capacity)
+		self.dir_x = grow(getattr(self, 'dir_x', None), capacity)
+		self.dir_y = grow(getattr(self, 'dir_y', None), capacity)
+		self.speed = grow(getattr(self, 'speed', None), capacity)
+		self.paddle_x = grow(getattr(self, 'paddle_x', None), (capacity, 2))
+		self.paddle_y = grow(getattr(self, 'paddle_y', None), (capacity, 2))
+
+		self.players.extend([None] * (capacity - self.capacity))
+		self.moving.extend([False] * (capacity - self.capacity))
+
+		self.free_slots.extend(range(capacity - 1, self.capacity - 1, -1))
+		self.capacity = capacity
+
+
+	def supports(self, game):
+		return len(game.users) == 2
+
+
+	def add_game(self, game):
+		if game in self.slots:
+			return
+
+		if not self.free_slots:
+			self.resize(self.capacity * 2)
+
+		slot = self.free_slots.pop()
+		self.slots[game] = slot
+		self.players[slot] = tuple(game.users.values())
+		self.load(game, slot)
+
+
+	def remove_game(self, game):
+		slot = self.slots.pop(game, None)
+		if slot is None:
+			return
+
+		self.store(game, slot)
+		self.players[slot] = None
+		self.free_slots.append(slot)
+
+
+	def load(self, game, slot):
+		''' Copy the Python state of the game into the buffers. '''
+		self.load_ball(game, slot)
+
+		for index, player in enumerate(self.players[slot]):
+			self.paddle_x[slot, index] = player.position.x
+			self.paddle_y[slot, index] = player.position.y
+
+
+	def load_ball(self, game, slot):
+		ball = game.ball
+		self.ball_x[slot] = ball.position.x
+		self.ball_y[slot] = ball.position.y
+		self.dir_x[slot] = ball.direction.x
+		self.dir_y[slot] = ball.direction.y
+		self.speed[slot] = ball.speed
+		self.moving[slot] = ball.moving
+
+
+	def store(self, game, slot):
+		''' Copy the buffers back into the Python state of the game. '''
+		ball = game.ball
+		ball.position.set(float(self.ball_x[slot]), float(self.ball_y[slot]))
+		ball.direction.set(float(self.dir_x[slot]), float(self.dir_y[slot]))
+		ball.speed = float(self.speed[slot])
+
+		for index, player in enumerate(self.players[slot]):
+			player.position.y = float(self.paddle_y[slot, index])
+
+
+	def store_positions(self, games):
+		''' Write back only what is needed to build the frames. '''
+		attached = [game for game in games if game in self.slots]
+		if not attached:
+			return
+
+		slots = [self.slots[game] for game in attached]
+		ball_x = self.ball_x[slots].tolist()
+		ball_y = self.ball_y[slots].tolist()
+		paddle_y = self.paddle_y[slots].tolist()
+
+		for game, slot, x, y, paddles in zip(attached, slots, ball_x, ball_y, paddle_y):
+			game.ball.position.set(x, y)
+			first, second = self.players[slot]
+			first.position.y = paddles[0]
+			second.position.y = paddles[1]
+
+
+	def step(self, games):
+		''' Advance the given started games by one physics step. '''
+		slots = [self.slots[game] for game in games]
+		players = self.players
+		last_moving = self.moving
+
+		inputs = []
+		for game, slot in zip(games, slots):
+			moving = game.ball.moving
+			if not (moving and last_moving[slot]):
+				# The ball is being served, the Python side owns it
+				self.load_ball(game, slot)
+
+			first, second = players[slot]
+			if first.inputs:
+				first.apply_input()
+			if second.inputs:
+				second.apply_input()
+
+			if game.recorder is not None:
+				game.recorder.capture(game)
+			game.ticks += 1
+			inputs += (moving, MOVEMENTS[first.movement], MOVEMENTS[second.movement])
+
+		slots = np.array(slots, dtype=np.intp)
+		inputs = np.array(inputs, dtype=np.float64).reshape(-1, 3)
+		moving = inputs[:, 0] != 0
+
+		ball_x = self.ball_x[slots]
+		ball_y = self.ball_y[slots]
+		dir_x = self.dir_x[slots]
+		dir_y = self.dir_y[slots]
+		speed = self.speed[slots]
+		paddle_x = self.paddle_x[slots]
+		paddle_y = self.paddle_y[slots]
+
+		# Players
+		paddle_y += inputs[:, 1:] * (PADDLE_SPEED * TICK_SCALE)
+		np.clip(paddle_y, PADDLE_MIN_Y, PADDLE_MAX_Y, out=paddle_y)
+
+		# Ball
+		distance = speed * TICK_SCALE
+		ball_x += np.where(moving, dir_x * distance, 0)
+		ball_y += np.where(moving, dir_y * distance, 0)
+
+		# Walls
+		scored = (ball_x >= (400 + BALL_RADIUS * 2)) | (ball_x <= -(400 + BALL_RADIUS * 2))
+		wall = ~scored & ((ball_y >= (300 - BALL_RADIUS)) | (ball_y <= -(300 - BALL_RADIUS)))
+		dir_y = np.where(wall, -dir_y, dir_y)
+
+		# Only the paddle on the side the ball is heading to can be hit
+		rows = np.arange(len(slots))
+		index = np.where((paddle_x[:, 0] > 0) == (dir_x > 0), 0, 1)
+		hit, new_x, new_y = swept_paddle_collision(
+			ball_x, ball_y, dir_x, dir_y, distance,
+			paddle_x[rows, index], paddle_y[rows, index]
+		)
+		hit &= ~(scored | wall)
+		dir_x = np.where(hit, new_x, dir_x)
+		dir_y = np.where(hit, new_y, dir_y)
+		speed = np.where(hit, speed + BALL_SPEED_INCREMENT, speed)
+
+		self.ball_x[slots] = ball_x
+		self.ball_y[slots] = ball_y
+		self.dir_x[slots] = dir_x
+		self.dir_y[slots] = dir_y
+		self.speed[slots] = speed
+		self.paddle_y[slots] = paddle_y
+
+		# Scoring is rare, let the Python side handle it
+		for index in np.flatnonzero(scored).tolist():
+			game = games[index]
+			slot = self.slots[game]
+			self.store(game, slot)
+			game.check_wall_collisions()
+			self.load_ball(game, slot)
+
+
+def swept_paddle_collision(ball_x, ball_y, dir_x, dir_y, distance, paddle_x, paddle_y):
+	''' Vectorized version of intersections.swept_circle_rect_collision. '''
+	half_width = PADDLE_WIDTH / 2 + BALL_RADIUS
+	half_height = PADDLE_HEIGHT / 2 + BALL_RADIUS
+
+	near_x, far_x = slab(paddle_x - ball_x, dir_x * distance, half_width)
+	near_y, far_y = slab(paddle_y - ball_y, dir_y * distance, half_height)
+
+	t_enter = np.maximum(np.maximum(near_x, near_y), 0)
+	t_exit = np.minimum(np.minimum(far_x, far_y), 1)
+	hit = t_enter <= t_exit
+
+	# Top or bottom edge of the paddle
+	edge = (near_y > 0) & (near_y > near_x)
+
+	# Front face, bounce with an angle depending on where the paddle was hit
+	hit_y = ball_y + dir_y * distance * t_enter
+	relative_y = (hit_y - (paddle_y - PADDLE_HEIGHT / 2)) / PADDLE_HEIGHT
+	offset = np.clip((relative_y - 0.5) * 2, -1, 1)
+
+	new_x = np.where(edge, dir_x, -dir_x)
+	new_y = np.where(edge, -dir_y, offset * 0.5)
+	length = np.where(edge, 1, np.hypot(new_x, new_y))
+
+	return hit, new_x / length, new_y / length
+
+
+def slab(offset, delta, half_size):
+	'''
+	Entry and exit times of a ray moving by `delta` through the slab
+	[offset - half_size, offset + half_size] along one axis.
+	'''
+	moving = delta != 0
+	safe_delta = np.where(moving, delta, 1)
+	t1 = (offset - half_size) / safe_delta
+	t2 = (offset + half_size) / safe_delta
+
+	# A ray parallel to the slab is either always or never inside it
+	inside = np.abs(offset) <= half_size
+	near = np.where(moving, np.minimum(t1, t2), np.where(inside, -np.inf, np.inf))
+	far = np.where(moving, np.maximum(t1, t2), np.where(inside, np.inf, -np.inf))
+
+	return near, far
@@ -0,0 +1,106 @@
+from .defines import *
+
+def flatten(state, prefix='', into=None):
+	''' {'ball': {'position': {'x': 1}}} -> {'ball.position.x': 1} '''
+	if into is None:
+		into = {}
+
+	for key, value in state.items():
+		if isinstance(value, dict):
+			flatten(value, f'{prefix}{key}.', into)
+		else:
+			into[f'{prefix}{key}'] = value
+
+	return into
+
+
+class DeltaEncoder:
+	'''
+	Per consumer encoder of delta compressed game frames.
+
+	Every frame gets a sequence number. A frame only carries the fields that
+	changed since the last frame acknowledged by the client (its base), and a
+	full keyframe is sent when there is no usable base or every
+	KEYFRAME_INTERVAL frames. Nothing is sent while the state does not change.
+	The client keeps the states it received by sequence number, applies each
+	delta on top of its base and acknowledges it with {'type': 'ack', 'seq': n}.
+
+	keyframe: {'type': 'frame', 'seq': 12, 'time': 1700000000000.0, 'key': True, 'state': {...}}
+	delta:    {'type': 'frame', 'seq': 13, 'time': 1700000000033.3, 'base': 12, 'delta': {'ball.position.x': 4.0}}
+
+	The server time of the frame is in its header, outside of the diffed
+	state, so it does not make every frame differ.
+
+	Fields that disappeared since the base (the timer once the game starts)
+	are listed in an optional 'removed' key.
+	'''
+
+	def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, history_size=DELTA_HISTORY):
+		self.keyframe_interval = keyframe_interval
+		self.history_size = history_size
+
+		self.seq = 0
+		self.last_keyframe = None
+		self.acked = None
+
+		# seq -> flat state, for the frames the client may acknowledge
+		self.history = {}
+
+
+	def ack(self, seq):
+		if seq not in self.history:
+			return
+
+		if self.acked is None or seq > self.acked:
+			self.acked = seq
+
+			# Older frames can not be used as a base anymore
+			for old in [old for old in self.history if old < seq]:
+				del self.history[old]
+
+
+	def encode(self, state, time=None):
+		''' Return the frame to send for the state, or None if nothing changed. '''
+		flat = flatten(state)
+		if self.history.get(self.seq) == flat:
+			return None
+
+		base = self.history.get(self.acked) if self.acked is not None else None
+		keyframe = (
+			base is None
+			or self.last_keyframe is None
+			or self.seq + 1 - self.last_keyframe >= self.keyframe_interval
+		)
+
+		if keyframe:
+			frame = {
+				'type': 'frame',
+				'seq': self.seq + 1,
+				'time': time,
+				'key': True,
+				'state': state
+			}
+
+		else:
+			delta = {key: value for key, value in flat.items() if key not in base or base[key] != value}
+			frame = {
+				'type': 'frame',
+				'seq': self.seq + 1,
+				'time': time,
+				'base': self.acked,
+				'delta': delta
+			}
+
+			removed = [key for key in base if key not in flat]
+			if removed:
+				frame['removed'] = removed
+
+		self.seq += 1
+		if keyframe:
+			self.last_keyframe = self.seq
+
+		self.history[self.seq] = flat
+		if len(self.history) > self.history_size:
+			del self.history[min(self.history)]
+
+		return frame
@@ -1,51 +1,80 @@
 import logging
 import time
+import random
 import asyncio
 import typing
 
-from channels.db import database_sync_to_async
-
 from typing import List, Dict, Union, Callable
 
 from .Ball import Ball
 from .Player import Player
 from .defines import *
 from .Vector import Vector2
+from .Snapshot import Snapshot
+from .Replay import ReplayRecorder
+from .ResultWriter import ResultWriter
+from .TimerWheel import TimerWheel, seconds_to_ticks
 from .intersections import *
 
-from game_service.models import GameModel, ScoreModel
-
-TIME_TO_SLEEP: float = (1 / FPS)
 
 logger = logging.getLogger(__name__)
 
+# Wall normals, shared and never mutated
+TOP_WALL_NORMAL = Vector2(0, 1)
+BOTTOM_WALL_NORMAL = Vector2(0, -1)
+
 class Game:
-	def __init__(self, game_id=None):
+	def __init__(self, game_id=None, scheduler=None, rng=None, timers=None):
 		self.game_id = game_id
+		self.scheduler = scheduler
 		self.status = 'waiting'
 		self.countdown = COUNTDOWN
 
-		self.ball = Ball()
+		# Timers of the loop stepping the game, a game stepped on its own
+		# with tick() advances its own wheel
+		if timers is None and scheduler is not None:
+			timers = scheduler.timers
+		self.own_timers = timers is None
+		self.timers = timers if timers is not None else TimerWheel()
+
+		# Seeded random.Random for reproducible games, the global one otherwise
+		self.rng = rng if rng is not None else random
+		self.ball = Ball(self.timers, self.rng)
+
+		# Physics steps run, and the input log when the game is recorded
+		self.ticks = 0
+		self.seed = None
+		self.recorder = None
 
 		self.users = {}
 		self.active_users = {}
 
 		self.consumers = []
 
-		self.pause_timer = None
+		self.pause_timer = None  # Timer ending the pause
 		self.pause_user_id = None
 		self.winner_id = None
 
+		# Scores of the previous owner of the game, after a failover
+		self.restored_scores = {}
+		self.lost = False
 
-	def add_user(self, consumer=None):
-		if consumer is None:
-			user_id = 0
-		else:
+		# Lifecycle, see GameManager.collect
+		self.created_at = time.monotonic()
+		self.finished_at = None
+		self.abandoned_at = None  # when the last consumer left
+
+
+	def add_user(self, consumer=None, user_id=0):
+		# Without a consumer the user is played locally or by a script
+		if consumer is not None:
 			self.consumers.append(consumer)
+			self.abandoned_at = None
 			user_id = consumer.user_id
 
 		if user_id not in self.users:
 			self.users[user_id] = Player(user_id, self.get_initial_pos())
+			self.users[user_id].score = self.restored_scores.get(user_id, 0)
 		
 		self.active_users[user_id] = True
 
@@ -63,17 +92,52 @@ class Game:
 
 
 	def remove_user(self, consumer):
-		self.consumers.remove(consumer)
+		if consumer in self.consumers:
+			self.consumers.remove(consumer)
 		user_id = consumer.user_id
 
 		if user_id in self.active_users:
 			self.active_users[user_id] = False
 
+		if not self.consumers:
+			self.abandoned_at = time.monotonic()
+
+
+	def is_abandoned(self, now, grace=ABANDON_GRACE):
+		return self.abandoned_at is not None and now - self.abandoned_at >= grace
+
+
+	def abandon(self):
+		''' Nobody watches the game anymore, stop it without a winner. '''
+		logger.info(f'game {self.game_id} abandoned')
+		self.status = 'finished'
+
+
+	def finish(self):
+		''' The result is saved and sent, the consumers are not needed anymore. '''
+		self.finished_at = time.monotonic()
+		self.consumers = []
+
+
+	async def notify_users(self, phases=None):
+		# Built and encoded once per side for all the consumers, then queued
+		# in each consumer outbox and sent concurrently by their writer tasks
+		snapshot = Snapshot(self)
+
+		if phases is not None:
+			# Profiled, build and encode the frames first to time them apart
+			start = time.perf_counter()
+			for consumer in self.consumers:
+				snapshot.prepare(self.get_side(consumer.user_id), getattr(consumer, 'protocol', 'json'))
+			now = time.perf_counter()
+			phases['state'] += now - start
+			start = now
 
-	async def notify_users(self):
 		for consumer in self.consumers:
-			game_state = self.get_game_state(consumer.user_id)
-			await consumer.send_json(game_state)
+			consumer.queue_snapshot(snapshot, self.get_side(consumer.user_id))
+
+		if phases is not None:
+			phases['notify'] += time.perf_counter() - start
 
 
 	async def start(self):
@@ -82,100 +146,149 @@ class Game:
 				return
 
 			self.status = 'ready'
+			self.timers.schedule(TICK_RATE, self.count_down)
+			await self.notify_users()
+
+			# The shared scheduler runs the countdown, then steps the game
+			# until it is finished
+			await self.scheduler.run_game(self)
 
-			while self.countdown >= 0:
-				await self.notify_users()
-				await asyncio.sleep(1)
-				self.countdown -= 1
+			if self.lost or self.winner_id is None:
+				return  # Run by another node now, or abandoned without a winner
 
-			self.status = 'started'
+			# Saved and sent even when a player quit during the countdown
+			if self.recorder is not None:
+				self.recorder.end(self)
+
+			self.save_game(self.winner_id)
 			await self.notify_users()
 
-			last_frame = time.time()
-			while self.status != 'finished':
+			self.finish()
 
-				if self.status == 'paused':
-					self.pause_timer = self.pause_timer - 0.1
-					if self.pause_timer <= 0:
-						self.status = 'started'
-					await self.notify_users()
-					await asyncio.sleep(0.1)
-					continue
+		except Exception as e:
+			logging.error(f'error: {e}')
 
-				self.pause_timer = None
-				self.pause_user_id = None
-				
-				for user_id, user in self.users.items():
-					user.move()
 
-				self.ball.move()
+	def count_down(self):
+		if self.status != 'ready':
+			return
 
-				await self.check_collisions()
-				await self.notify_users()
+		self.countdown -= 1
+		if self.countdown >= 0:
+			self.timers.schedule(TICK_RATE, self.count_down)
+			return
 
-				current_frame = time.time()
-				if current_frame - last_frame < TIME_TO_SLEEP:
-					await asyncio.sleep(TIME_TO_SLEEP - (current_frame - last_frame))
-				
-				last_frame = current_frame
+		self.status = 'started'
+		self.start_recording()
 
-			await self.save_game(self.winner_id)
-			await self.notify_users()
 
+	def start_recording(self):
+		''' Record the inputs of the game, when it was created with a seed. '''
+		if self.seed is None:
+			return
 
-		except Exception as e:
-			logging.error(f'error: {e}')
+		engine = self.scheduler.engine if self.scheduler is not None else None
+		recorded_engine = 'numpy' if engine is not None and engine.supports(self) else 'python'
+		self.recorder = ReplayRecorder(self, self.seed, recorded_engine)
+
+
+	def tick(self, phases=None):
+		''' One physics step, `phases` sums the time of each phase when profiled. '''
+		if self.own_timers:
+			self.timers.advance()
+
+		if self.status == 'ready':
+			return  # Counting down, the inputs wait for the start
+
+		if phases is not None:
+			start = time.perf_counter()
+
+		for user in self.users.values():
+			if user.inputs:
+				user.apply_input()
+
+		if self.recorder is not None:
+			self.recorder.capture(self)
+		self.ticks += 1
+
+		if self.status == 'paused':
+			return
+
+		for user_id, user in self.users.items():
+			user.move()
+
+		if phases is None:
+			self.ball.move()
+			self.check_collisions()
+			return
+
+		now = time.perf_counter()
+		phases['players'] += now - start
+		start = now
+
+		self.ball.move()
+
+		now = time.perf_counter()
+		phases['ball'] += now - start
+		start = now
 
+		self.check_collisions()
 
-	async def check_collisions(self):
-		future_position = self.ball.position + self.ball.direction.scale(self.ball.speed)
+		phases['collisions'] += time.perf_counter() - start
 
-		collision_normal = await self.check_wall_collisions(self.ball.position, future_position)
+
+	def check_collisions(self):
+		ball = self.ball
+
+		collision_normal = self.check_wall_collisions()
 		if collision_normal:
 			# Reflect the ball's direction based on wall collision
-			self.ball.direction = self.ball.direction.reflect(collision_normal)
+			ball.direction.reflect_ip(collision_normal)
 			return
 
+		# Only the paddle on the side the ball is heading to can be hit
+		heading_right = ball.direction.x > 0
 		for user in self.users.values():
-			direction = line_rect_collision(self.ball.position, future_position, user)
-			if direction:
-				# Reflect the ball's direction based on the collision normal
-				self.ball.direction = direction
-				self.ball.increase_speed()
-				break
+			if (user.position.x > 0) != heading_right:
+				continue
+
+			# The new direction is written in place in ball.direction
+			if swept_circle_rect_collision(ball.position, ball.direction, ball.speed * TICK_SCALE, user):
+				ball.increase_speed()
+			break
 
 
-	async def check_wall_collisions(self, start, end):
+	def check_wall_collisions(self):
 		# Check collision with left wall
 		if self.ball.position.x >= (400 + BALL_RADIUS * 2):
-			self.ball.position = Vector2(0, 0)
+			self.ball.position.set(0, 0)
 			user = self.get_user_by_x_position((400 - 20))
 			user.score += 1
 
-			if await self.check_game_finished():
+			if self.check_game_finished():
 				return None
 
-			asyncio.create_task(self.ball.reset(direction='left'))
+			self.ball.reset(direction='left')
 			return None
 
 		# Check collision with right wall
 		if self.ball.position.x <= -(400 + BALL_RADIUS * 2):
 			user = self.get_user_by_x_position(-(400 - 20))
 			user.score += 1
-			self.ball.position = Vector2(0, 0)
+			self.ball.position.set(0, 0)
 
-			if await self.check_game_finished():
+			if self.check_game_finished():
 				return None
 
-			asyncio.create_task(self.ball.reset(direction='right'))
+			self.ball.reset(direction='right')
 			return None
 		
 		# Check collision with top wall
 		if self.ball.position.y >= (300 - BALL_RADIUS):
-			return Vector2(0, 1)  # Collision normal facing down
+			return TOP_WALL_NORMAL  # Collision normal facing down
 		# Check collision with bottom wall
 		if self.ball.position.y <= -(300 - BALL_RADIUS):
-			return Vector2(0, -1)  # Collision normal facing up
+			return BOTTOM_WALL_NORMAL  # Collision normal facing up
 		
 		return None
 
@@ -184,9 +297,7 @@ class Game:
 		if self.status != 'started':
 			return
 
-		self.status = 'paused'
-		self.pause_timer = PAUSE_TIMER
-		self.pause_user_id = user_id
+		self.start_pause(user_id)
 
 		logger.info(f'pause game by {user_id}')
 		await self.notify_users()
@@ -199,14 +310,31 @@ class Game:
 		if user_id and user_id != self.pause_user_id:
 			return
 
-		self.status = 'started'
-		self.pause_timer = None
-		self.pause_user_id = None
+		self.end_pause()
 
 		logger.info(f'unpause the game')
 		await self.notify_users()
 
 
+	def start_pause(self, user_id=None):
+		self.status = 'paused'
+		self.pause_user_id = user_id
+		self.pause_timer = self.timers.schedule(seconds_to_ticks(PAUSE_TIMER), self.end_pause)
+
+
+	def end_pause(self):
+		''' Resume the game, on unpause or when the pause timer runs out. '''
+		if self.status != 'paused':
+			return
+
+		if self.pause_timer is not None:
+			self.pause_timer.cancel()
+
+		self.status = 'started'
+		self.pause_timer = None
+		self.pause_user_id = None
+
+
 	async def quit(self, user_id):
 		logger.info(f'game quit')
 		self.active_users[user_id] = False
@@ -217,36 +345,25 @@ class Game:
 				self.winner_id = uid
 				self.users[uid].score = POINTS_TO_WIN
 				self.status = 'finished'
+
+				if self.recorder is not None:
+					self.recorder.record_quit(self, uid)
 	
 	
-	async def save_game(self, winner_id):
-		try:
-			game = await database_sync_to_async(
-				GameModel.objects.get
-			)(id=self.game_id)
-
-			logger.info(self.users)
-			for user_id, user in self.users.items():
-				logger.info(f'user id: {user.id} {user_id}')
-				score = await database_sync_to_async(ScoreModel.objects.create)(
-					game_id=game.id,
-					user_id=user.id,
-					score=user.score
-				)
-
-				logger.info(score)
-
-			game.winner_id = winner_id
-			game.status = 'finished'
-			await database_sync_to_async(game.save)()
-		
-		except GameModel.DoesNotExist:
-			logger.error(f'Game {self.game_id} does not exist')
-		except Exception as e:
-			logger.error(f'Cannot save game: {e}')
+	def save_game(self, winner_id):
+		''' Queue the result, written in the background by the ResultWriter. '''
+		if self.game_id is None:
+			return  # Local games have no row
+
+		replay = None
+		if self.recorder is not None:
+			replay = (self.ticks, self.recorder.to_bytes())
+
+		scores = {user.id: user.score for user in self.users.values()}
+		ResultWriter().submit(self.game_id, winner_id, scores, replay)
 
 
-	async def check_game_finished(self):
+	def check_game_finished(self):
 		finished = False
 		for user in self.users.values():
 			if user.score >= POINTS_TO_WIN:
@@ -269,6 +386,12 @@ class Game:
 		user.setMovement(movement)
 
 
+	def queue_input(self, user_id, seq, movement, tick=None):
+		user = self.users.get(user_id)
+		if user is not None:
+			user.queue_input(seq, movement, tick)
+
+
 	def get_active_users_count(self):
 		return list(self.active_users.values()).count(True)
 
@@ -288,6 +411,8 @@ class Game:
 		return {
 			'id': user_id,
 			'score': user.score,
+			'input_seq': user.input_seq,
+			'input_tick': user.input_tick,
 			'position': {
 				'x': user.position.x,
 				'y': user.position.y
@@ -295,6 +420,19 @@ class Game:
 		} if user else None
 
 
+	def get_side(self, user_id):
+		''' Side of the user, spectators see the game from the right side. '''
+		user = self.users.get(user_id)
+		return 'left' if user is not None and user.position.x < 0 else 'right'
+
+
+	def get_side_state(self, side):
+		for user_id, user in self.users.items():
+			if (user.position.x < 0) == (side == 'left'):
+				return self.get_game_state(user_id)
+		return None
+
+
 	def get_game_state(self, user_id):
 		if user_id is None:
 			return
@@ -325,6 +463,6 @@ class Game:
 		if self.status == 'ready':
 			data['timer'] = self.countdown
 		elif self.status == 'paused':
-			data['timer'] = self.pause_timer
+			data['timer'] = self.pause_timer.remaining() if self.pause_timer is not None else None
 
 		return data
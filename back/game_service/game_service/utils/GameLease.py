@@ -0,0 +1,137 @@
+import logging
+import json
+
+from django_redis import get_redis_connection
+
+from .defines import *
+
+logger = logging.getLogger(__name__)
+
+# Take the lease when it is free, or extend it when already held by the
+# caller, and return the current owner
+ACQUIRE_SCRIPT = '''
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+	redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+	return ARGV[1]
+end
+if owner == ARGV[1] then
+	redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return owner
+'''
+
+# Renew the leases held by the caller and save the checkpoint of their
+# games, KEYS holds lease, checkpoint key pairs and ARGV[4:] the scores of
+# each game. Returns 1 per renewed lease, 0 per lost one.
+RENEW_SCRIPT = '''
+local renewed = {}
+for i = 1, #KEYS, 2 do
+	if redis.call('GET', KEYS[i]) == ARGV[1] then
+		redis.call('PEXPIRE', KEYS[i], ARGV[2])
+		redis.call('SET', KEYS[i + 1], ARGV[3 + (i + 1) / 2], 'EX', ARGV[3])
+		renewed[#renewed + 1] = 1
+	else
+		renewed[#renewed + 1] = 0
+	end
+end
+return renewed
+'''
+
+RELEASE_SCRIPT = '''
+for _, key in ipairs(KEYS) do
+	if redis.call('GET', key) == ARGV[1] then
+		redis.call('DEL', key)
+	end
+end
+return 1
+'''
+
+
+class LeaseLostError(Exception):
+	pass
+
+
+class GameLease:
+	'''
+	Redis lease giving the ownership of a remote game to a single node.
+
+	The owner is identified by the channel its game node listens to, so
+	the other nodes can forward the player connections to it. The owner
+	renews the lease every LEASE_RENEW_INTERVAL, when it stops doing so
+	(crash, network split) the lease expires after LEASE_TTL and the next
+	node asking for the game takes it over, restoring the scores from the
+	last checkpoint.
+
+	A node renews all its leases, and saves their checkpoints, with a single
+	script per interval (see renew_all).
+	'''
+
+	def __init__(self, ttl=LEASE_TTL):
+		self.ttl = ttl
+		self.redis = get_redis_connection('default')
+
+		self.acquire_script = self.redis.register_script(ACQUIRE_SCRIPT)
+		self.renew_script = self.redis.register_script(RENEW_SCRIPT)
+		self.release_script = self.redis.register_script(RELEASE_SCRIPT)
+
+
+	@staticmethod
+	def key(game_id):
+		return f'game:{game_id}:owner'
+
+
+	@staticmethod
+	def checkpoint_key(game_id):
+		return f'game:{game_id}:checkpoint'
+
+
+	def acquire(self, game_id, owner):
+		''' Return the owner of the game, `owner` if it got the lease. '''
+		current = self.acquire_script(keys=[self.key(game_id)], args=[owner, int(self.ttl * 1000)])
+		return current.decode() if isinstance(current, bytes) else current
+
+
+	def renew_all(self, owner, checkpoints, released=()):
+		'''
+		Renew the leases of the games of `checkpoints` (game id -> user id ->
+		score) and save their scores, release the `released` ones, in one
+		round trip. Return the ids of the games whose lease was renewed.
+		'''
+		game_ids = list(checkpoints)
+		pipeline = self.redis.pipeline(transaction=False)
+
+		if released:
+			self.release_script(keys=[self.key(game_id) for game_id in released], args=[owner], client=pipeline)
+
+		if game_ids:
+			keys = []
+			for game_id in game_ids:
+				keys += [self.key(game_id), self.checkpoint_key(game_id)]
+			args = [owner, int(self.ttl * 1000), CHECKPOINT_TTL]
+			args += [json.dumps(checkpoints[game_id]) for game_id in game_ids]
+			self.renew_script(keys=keys, args=args, client=pipeline)
+
+		results = pipeline.execute()
+		if not game_ids:
+			return set()
+		return {game_id for game_id, renewed in zip(game_ids, results[-1]) if renewed}
+
+
+	def owner(self, game_id):
+		owner = self.redis.get(self.key(game_id))
+		return owner.decode() if owner is not None else None
+
+
+	def owners(self, game_ids):
+		''' Owner of each game, None when its lease is free. '''
+		owners = self.redis.mget([self.key(game_id) for game_id in game_ids])
+		return [owner.decode() if owner is not None else None for owner in owners]
+
+
+	def load_checkpoint(self, game_id):
+		''' user id -> score saved by the previous owner, if any. '''
+		checkpoint = self.redis.get(self.checkpoint_key(game_id))
+		if checkpoint is None:
+			return {}
+		return {int(user_id): score for user_id, score in json.loads(checkpoint).items()}
@@ -1,4 +1,23 @@
+import logging
+import asyncio
+import time
+import random
+import zlib
+
+from asgiref.sync import sync_to_async
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
 from .Game import Game
+from .Scheduler import Scheduler
+from .BatchEngine import BatchEngine
+from .GameLease import GameLease, LeaseLostError
+from .TickProfiler import TickProfiler
+from .ResultWriter import ResultWriter
+from .defines import *
+
+logger = logging.getLogger(__name__)
 
 class GameManager:
 	_instance = None
@@ -7,21 +26,301 @@ class GameManager:
 		if not cls._instance:
 			cls._instance = super(GameManager, cls).__new__(cls, *args, **kwargs)
 			cls._instance.games = {}
+			cls._instance.scheduler = Scheduler(
+				engine=cls.create_engine(),
+				profiler=TickProfiler(getattr(settings, 'GAME_PROFILING', 'sampled'))
+			)
+
+			# Remote games are owned through a lease by the game node of
+			# the process, see consumers/worker.py
+			cls._instance.node_channel = None
+			cls._instance.lease = None
+			cls._instance.leases = set()
+			cls._instance.lease_task = None
+			cls._instance.checkpoints = {}  # game id -> scores of a game taken over
+
+			# Connections to remote games, whose owner is watched for a
+			# failover once per game
+			cls._instance.watchers = defaultdict(set)  # game id -> consumers
+			cls._instance.watch_task = None
+
+			cls._instance.eviction_task = None
+			cls._instance.evicted = 0
 		return cls._instance
 
 
+	@staticmethod
+	def create_engine():
+		if getattr(settings, 'GAME_ENGINE', 'python') == 'numpy' and BatchEngine.available:
+			return BatchEngine()
+		return None
+
+
+	@staticmethod
+	def get_worker_channels():
+		return [f'game-worker-{index}' for index in range(getattr(settings, 'GAME_WORKERS', 0))]
+
+
+	@staticmethod
+	def get_worker_channel(key):
+		'''
+		Channel of the game worker owning the game with the given key (the
+		game id, or the consumer channel for local games), None when the
+		games run in the current process.
+		'''
+		workers = getattr(settings, 'GAME_WORKERS', 0)
+		if not workers:
+			return None
+
+		if not isinstance(key, int):
+			key = zlib.crc32(str(key).encode())
+
+		return f'game-worker-{key % workers}'
+
+
 	def get_game(self, game_id):
 		return self.games.get(game_id)
 
 
 	def create_game(self, game_id=None):
+		if self.eviction_task is None or self.eviction_task.done():
+			self.eviction_task = asyncio.create_task(self.run_eviction())
+
 		if game_id is None:
-			return Game()
+			return Game(scheduler=self.scheduler)
 
 		if game_id not in self.games:
-			game = Game(game_id)
+			if getattr(settings, 'GAME_REPLAYS', False):
+				# Seeded so the game can be replayed from its inputs
+				seed = random.getrandbits(63)
+				game = Game(game_id, scheduler=self.scheduler, rng=random.Random(seed))
+				game.seed = seed
+			else:
+				game = Game(game_id, scheduler=self.scheduler)
+
+			# Taken over from a previous owner, read when claiming the game
+			game.restored_scores = self.checkpoints.pop(game_id, {})
 			self.games[game_id] = game
 			return game
 
 		else:
 			return None  # Game already exists
+
+
+	def get_lease(self):
+		if self.lease is None:
+			self.lease = GameLease()
+		return self.lease
+
+
+	async def claim_game(self, game_id):
+		''' Channel of the node owning the remote game, the lease is taken when free. '''
+		owner = await sync_to_async(self.acquire_game, thread_sensitive=False)(game_id)
+
+		if owner == self.node_channel and game_id not in self.leases:
+			self.leases.add(game_id)
+			if self.lease_task is None or self.lease_task.done():
+				self.lease_task = asyncio.create_task(self.renew_leases())
+
+		return owner
+
+
+	def acquire_game(self, game_id):
+		''' Blocking part of claim_game, run in a thread. '''
+		lease = self.get_lease()
+		owner = lease.acquire(game_id, self.node_channel)
+
+		if owner == self.node_channel and game_id not in self.leases and game_id not in self.games:
+			checkpoint = lease.load_checkpoint(game_id)
+			if checkpoint:
+				self.checkpoints[game_id] = checkpoint
+		return owner
+
+
+	async def get_owner(self, game_id):
+		return await sync_to_async(self.get_lease().owner, thread_sensitive=False)(game_id)
+
+
+	async def renew_leases(self):
+		lease = self.get_lease()
+
+		while self.leases:
+			await asyncio.sleep(LEASE_RENEW_INTERVAL)
+
+			# The scores are read on the loop, the Redis round trip is made
+			# in a thread
+			released = []
+			games = {}
+			for game_id in list(self.leases):
+				game = self.games.get(game_id)
+				if game is None or game.status == 'finished':
+					released.append(game_id)
+					self.leases.discard(game_id)
+					self.checkpoints.pop(game_id, None)
+				else:
+					games[game_id] = game
+
+			checkpoints = {
+				game_id: {user_id: user.score for user_id, user in game.users.items()}
+				for game_id, game in games.items()
+			}
+
+			try:
+				renewed = await sync_to_async(lease.renew_all, thread_sensitive=False)(
+					self.node_channel, checkpoints, released
+				)
+			except Exception as e:
+				logger.error(f'error while renewing the leases of {len(games)} games: {e}')
+				continue
+
+			for game_id, game in games.items():
+				if game_id not in renewed and self.games.get(game_id) is game:
+					self.lose_game(game)
+
+
+	def watch_owner(self, game_id, consumer):
+		''' Call consumer.rejoin() when the node owning the game changes. '''
+		self.watchers[game_id].add(consumer)
+
+		if self.watch_task is None or self.watch_task.done():
+			self.watch_task = asyncio.create_task(self.watch_owners())
+
+
+	def unwatch_owner(self, game_id, consumer):
+		consumers = self.watchers.get(game_id)
+		if consumers is None:
+			return
+
+		consumers.discard(consumer)
+		if not consumers:
+			del self.watchers[game_id]
+
+
+	async def watch_owners(self):
+		''' Failover, the lease of a crashed owner expires and is taken over. '''
+		lease = self.get_lease()
+
+		while self.watchers:
+			await asyncio.sleep(LEASE_RENEW_INTERVAL)
+
+			game_ids = list(self.watchers)
+			try:
+				owners = await sync_to_async(lease.owners, thread_sensitive=False)(game_ids)
+			except Exception as e:
+				logger.error(f'error while checking the owners of {len(game_ids)} games: {e}')
+				continue
+
+			changed = [
+				consumer
+				for game_id, owner in zip(game_ids, owners)
+				for consumer in list(self.watchers.get(game_id, ()))
+				if consumer.owner is not None and consumer.owner != owner
+			]
+			results = await asyncio.gather(*(consumer.rejoin() for consumer in changed), return_exceptions=True)
+			for consumer, result in zip(changed, results):
+				if isinstance(result, Exception):
+					logger.error(f'error while joining game {consumer.game_id} again: {result}')
+
+
+	def lose_game(self, game):
+		''' The lease expired, another node may already run the game. '''
+		logger.warning(f'lease of game {game.game_id} lost')
+
+		self.leases.discard(game.game_id)
+		self.games.pop(game.game_id, None)
+
+		game.lost = True
+		self.scheduler.remove_game(game, LeaseLostError(f'lease of game {game.game_id} lost'))
+
+		consumers, game.consumers = game.consumers, []
+		for consumer in consumers:
+			asyncio.create_task(consumer.owner_lost())
+
+
+	def remove_game(self, game_id):
+		game = self.games.pop(game_id, None)
+		if game is None:
+			return
+
+		self.scheduler.remove_game(game)
+		game.consumers = []
+		self.evicted += 1
+
+
+	def collect(self, now=None):
+		'''
+		Stop the running games nobody watches since ABANDON_GRACE, and evict
+		the games finished since FINISHED_GRACE or still waiting for players
+		that left. Return the number of evicted games.
+		'''
+		now = time.monotonic() if now is None else now
+
+		# Local games are only referenced by the scheduler
+		for game in list(self.scheduler.games):
+			if game.status != 'finished' and game.is_abandoned(now):
+				game.abandon()
+
+		evicted = self.evicted
+		for game_id, game in list(self.games.items()):
+			if game.status == 'finished' and game.finished_at is None:
+				# Finished outside of Game.start (quit during the countdown)
+				game.finished_at = now
+
+			if game.finished_at is not None and now - game.finished_at >= FINISHED_GRACE:
+				self.remove_game(game_id)
+			elif game.status in ('waiting', 'ready') and game.is_abandoned(now):
+				game.abandon()
+				self.remove_game(game_id)
+
+		return self.evicted - evicted
+
+
+	async def run_eviction(self):
+		while self.games or self.scheduler.games:
+			await asyncio.sleep(EVICTION_INTERVAL)
+
+			try:
+				evicted = self.collect()
+				if evicted:
+					logger.info(f'{evicted} games evicted, {len(self.games)} left')
+			except Exception as e:
+				logger.error(f'error while evicting the games: {e}')
+
+
+	def outbox_stats(self):
+		''' Frames queued, sent and dropped for the players connected to the games of the process. '''
+		totals = Counter()
+		# The local games are only known by the scheduler
+		for game in set(self.games.values()) | set(self.scheduler.games):
+			for consumer in game.consumers:
+				totals.update(consumer.outbox.stats())
+
+		return {key: totals[key] for key in ('queued', 'sent', 'dropped')}
+
+
+	def input_stats(self):
+		''' Inputs coalesced, and dropped past MAX_PENDING_INPUTS, for the players of the games of the process. '''
+		players = [
+			player
+			for game in set(self.games.values()) | set(self.scheduler.games)
+			for player in game.users.values()
+		]
+		return {
+			'coalesced': sum(player.coalesced_inputs for player in players),
+			'dropped': sum(player.dropped_inputs for player in players),
+		}
+
+
+	def stats(self):
+		return {
+			'games': len(self.games),
+			'statuses': dict(Counter(game.status for game in self.games.values())),
+			'running': len(self.scheduler.games),
+			'consumers': sum(len(game.consumers) for game in self.games.values()),
+			'evicted': self.evicted,
+			'leases': len(self.leases),
+			'outboxes': self.outbox_stats(),
+			'inputs': self.input_stats(),
+			'scheduler': self.scheduler.stats(),
+			'results': ResultWriter().stats(),
+		}
@@ -0,0 +1,160 @@
+import random
+import time
+
+from .Game import Game
+from .TimerWheel import TimerWheel
+from .defines import *
+
+USER_IDS = (1, 2)
+
+def follow_ball(game, user):
+	''' Scripted player, moves its paddle toward the ball with a dead zone. '''
+	offset = game.ball.position.y - user.position.y
+	if offset < -PADDLE_HEIGHT / 4:
+		return 'UP'
+	if offset > PADDLE_HEIGHT / 4:
+		return 'DOWN'
+	return 'NONE'
+
+
+class BallFollower:
+	'''
+	Scripted players of one game, following the ball but letting it through
+	on a `miss` share of its approaches so the games end, like the bots of
+	load_games.
+	'''
+
+	def __init__(self, rng, miss):
+		self.rng = rng
+		self.miss = miss
+		self.distances = {}  # user id -> distance of the ball to the paddle in the last frame
+		self.approaching = set()
+		self.missing = set()
+
+	def __call__(self, game, user):
+		distance = abs(game.ball.position.x - user.position.x)
+		previous = self.distances.get(user.id)
+		self.distances[user.id] = distance
+
+		if previous is not None and distance < previous:
+			if user.id not in self.approaching:
+				# A new approach, drawn once
+				self.approaching.add(user.id)
+				if self.rng.random() < self.miss:
+					self.missing.add(user.id)
+				else:
+					self.missing.discard(user.id)
+		else:
+			self.approaching.discard(user.id)
+
+		if user.id in self.missing and user.id in self.approaching:
+			return 'NONE'
+		return follow_ball(game, user)
+
+
+class HeadlessRunner:
+	'''
+	Steps started games without consumers, database nor event loop, the
+	same way the Scheduler does.
+
+	Each game gets its own random.Random seeded from `seed`, and the
+	players are driven by `script(game, user)` through the sequenced input
+	queue, so two runs with the same seed and engine give the same games.
+	Without a script, a seeded BallFollower per game misses a `miss` share
+	of the balls. Like real clients, the scripts only see the games at
+	BROADCAST_RATE. The games start at `score` points each, a finished game
+	is replaced by a new one to keep the load constant.
+	'''
+
+	def __init__(self, games, seed=0, engine=None, script=None, miss=0.2, score=0):
+		self.seed = seed
+		self.engine = engine
+		self.script = script
+		self.miss = miss
+		self.score = score
+		self.scripts = {}  # game -> its BallFollower
+		self.timers = TimerWheel()
+
+		self.next_seed = seed
+		self.steps_per_broadcast = max(TICK_RATE // BROADCAST_RATE, 1)
+		self.finished = 0
+		self.ticks = 0
+		self.games = [self.create_game() for _ in range(games)]
+
+
+	def create_game(self):
+		game = Game(rng=random.Random(self.next_seed), timers=self.timers)
+		if self.script is None:
+			self.scripts[game] = BallFollower(random.Random(f'script-{self.next_seed}'), self.miss)
+		self.next_seed += 1
+
+		for user_id in USER_IDS:
+			game.add_user(user_id=user_id)
+			game.users[user_id].score = self.score
+		game.status = 'started'
+
+		if self.engine is not None:
+			self.engine.add_game(game)
+
+		return game
+
+
+	def send_inputs(self, game):
+		script = self.script or self.scripts[game]
+		for user in game.users.values():
+			movement = script(game, user)
+			if movement != user.movement and not user.inputs:
+				user.queue_input(user.last_queued_seq + 1, movement, self.ticks)
+
+
+	def step(self):
+		self.timers.advance()
+
+		games = self.games
+		if self.ticks % self.steps_per_broadcast == 0:
+			if self.engine is not None:
+				self.engine.store_positions(games)
+			for game in games:
+				self.send_inputs(game)
+
+		if self.engine is not None:
+			self.engine.step(games)
+		else:
+			for game in games:
+				game.tick()
+
+		self.ticks += 1
+
+		for index, game in enumerate(games):
+			if game.status == 'finished':
+				if self.engine is not None:
+					self.engine.remove_game(game)
+				self.scripts.pop(game, None)
+				games[index] = self.create_game()
+				self.finished += 1
+
+
+	def run(self, ticks):
+		''' Step `ticks` times, return the duration of each step in seconds. '''
+		durations = []
+		for _ in range(ticks):
+			start = time.perf_counter()
+			self.step()
+			durations.append(time.perf_counter() - start)
+		return durations
+
+
+	def checksum(self):
+		''' Digest of the games state, to compare two runs. '''
+		if self.engine is not None:
+			self.engine.store_positions(self.games)
+
+		state = tuple(
+			(
+				round(game.ball.position.x, 6),
+				round(game.ball.position.y, 6),
+				tuple((user.score, round(user.position.y, 6)) for user in game.users.values())
+			)
+			for game in self.games
+		)
+		return hash((state, self.finished))
@@ -0,0 +1,142 @@
+import logging
+import asyncio
+import uuid
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from collections import Counter
+
+from game_service.models import GameModel, TournamentModel
+from .MatchmakingQueue import MatchmakingQueue
+from .defines import *
+
+logger = logging.getLogger(__name__)
+
+class Matchmaker:
+	'''
+	Forms the matches of the matchmaking queues, every MATCH_INTERVAL.
+
+	Each pass matches all the users it can at once (see
+	MatchmakingQueue.match), creates their games or tournaments with a
+	single bulk_create, and notifies the users through the group of the
+	channel layer their matchmaking connections listen to.
+
+	The loop runs in every process with matchmaking connections, but a
+	Redis lock expiring after MATCH_INTERVAL lets a single process run
+	the pass of a queue at a time. The Redis calls run in a thread, the
+	event loop keeps running the games meanwhile.
+	'''
+
+	_instance = None
+
+	def __new__(cls, *args, **kwargs):
+		if not cls._instance:
+			cls._instance = super(Matchmaker, cls).__new__(cls, *args, **kwargs)
+			cls._instance.consumers = Counter()  # queue type -> connections
+			cls._instance.queues = {}
+			cls._instance.task = None
+			cls._instance.owner = str(uuid.uuid4())
+			cls._instance.passes = 0
+			cls._instance.matches = 0
+			cls._instance.failed = 0
+		return cls._instance
+
+
+	@staticmethod
+	def user_group(user_id):
+		return f'matchmaking_user_{user_id}'
+
+
+	def get_queue(self, queue_type):
+		if queue_type not in self.queues:
+			self.queues[queue_type] = MatchmakingQueue(queue_type)
+		return self.queues[queue_type]
+
+
+	def add_consumer(self, queue_type):
+		self.consumers[queue_type] += 1
+
+		if self.task is None or self.task.done():
+			self.task = asyncio.create_task(self.run())
+
+
+	def remove_consumer(self, queue_type):
+		self.consumers[queue_type] -= 1
+		if self.consumers[queue_type] <= 0:
+			del self.consumers[queue_type]
+
+
+	async def run(self):
+		while self.consumers:
+			for queue_type in list(self.consumers):
+				try:
+					await self.match(queue_type)
+				except Exception as e:
+					logger.error(f'error while matching the {queue_type} queue: {e}')
+
+			await asyncio.sleep(MATCH_INTERVAL)
+
+
+	async def match(self, queue_type):
+		queue = self.get_queue(queue_type)
+
+		matches = await sync_to_async(self.run_pass, thread_sensitive=False)(queue)
+		if matches is None:
+			return  # Pass run by another process
+
+		self.passes += 1
+		if not matches:
+			return
+
+		try:
+			ids = await database_sync_to_async(self.create_rows)(queue_type, matches)
+		except Exception as e:
+			logger.error(f'Cannot create the {queue_type}s of {len(matches)} matches: {e}')
+			self.failed += len(matches)
+			await sync_to_async(queue.requeue, thread_sensitive=False)(matches)
+			return
+
+		self.matches += len(matches)
+
+		if queue_type == 'game':
+			messages = [
+				(user_id, {'type': 'game_found_response', 'game_id': game_id})
+				for users, game_id in zip(matches, ids) for user_id in users
+			]
+		else:
+			messages = [
+				(user_id, {'type': 'tournament_found_response', 'tournament_id': tournament_id})
+				for users, tournament_id in zip(matches, ids) for user_id in users
+			]
+
+		channel_layer = get_channel_layer()
+		await asyncio.gather(*(
+			channel_layer.group_send(self.user_group(user_id), message)
+			for user_id, message in messages
+		))
+
+
+	def run_pass(self, queue):
+		''' Matches of a pass over the queue, None when another process runs it. '''
+		lock_key = f'matchmaking:{queue.queue_type}:matcher'
+		if not queue.redis.set(lock_key, self.owner, nx=True, px=int(MATCH_INTERVAL * 1000)):
+			return None
+		return queue.match()
+
+
+	@staticmethod
+	def create_rows(queue_type, matches):
+		''' Ids of the games or tournaments created for the matches, in their order. '''
+		model = GameModel if queue_type == 'game' else TournamentModel
+		rows = model.objects.bulk_create([model(user_ids=list(users)) for users in matches])
+		return [row.id for row in rows]
+
+
+	def stats(self):
+		return {
+			'consumers': dict(self.consumers),
+			'passes': self.passes,
+			'matches': self.matches,
+			'failed': self.failed,
+		}
@@ -0,0 +1,363 @@
+import logging
+import time
+
+from collections import Counter
+
+from django_redis import get_redis_connection
+
+from .defines import *
+
+logger = logging.getLogger(__name__)
+
+# Users matched together by each queue
+QUEUE_SIZES = {
+	'game': 2,
+	'tournament': TOURNAMENT_USERS_NUMBER,
+}
+
+# Upper bounds of the wait time buckets, in sec, the last bucket is unbounded
+WAIT_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300)
+
+# The list holds 'user:seq' entries, the index maps each queued user to
+# 'seq:joined_ms'. An entry whose seq is not the one of the index is a
+# tombstone left by a cancel, dropped when it reaches the front.
+
+# Append the user unless already queued, return 1 when added. The list is
+# rebuilt when it holds more tombstones than queued users (plus a slack),
+# at least half of it is dropped so pushing stays O(1) amortized.
+PUSH_SCRIPT = '''
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+	return 0
+end
+local seq = redis.call('INCR', KEYS[3])
+redis.call('HSET', KEYS[2], ARGV[1], seq .. ':' .. ARGV[2])
+redis.call('RPUSH', KEYS[1], ARGV[1] .. ':' .. seq)
+redis.call('ZADD', KEYS[4], ARGV[4], ARGV[1])
+
+local length = redis.call('LLEN', KEYS[1])
+if length > 2 * redis.call('HLEN', KEYS[2]) + tonumber(ARGV[3]) then
+	local live = {}
+	for _, entry in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+		local user, entry_seq = string.match(entry, '^(%d+):(%d+)$')
+		local value = redis.call('HGET', KEYS[2], user)
+		if value and string.match(value, '^(%d+):') == entry_seq then
+			live[#live + 1] = entry
+		end
+	end
+	redis.call('DEL', KEYS[1], KEYS[5])
+	for i = 1, #live, 1000 do
+		redis.call('RPUSH', KEYS[1], unpack(live, i, math.min(i + 999, #live)))
+	end
+end
+return 1
+'''
+
+# One matching pass over ARGV[6] entries of the list, from a cursor going
+# round the list so the users behind ones that cannot be matched get their
+# turn, the oldest first. Each user still queued is matched with the ARGV[1] - 1 users closest in rating:
+# the candidates are the runs of ARGV[1] neighbours of the sorted set
+# holding the user, the tightest one is taken when its gap fits in the
+# window of one of its users. The window grows with the wait: ARGV[3] +
+# ARGV[4] per sec, up to ARGV[5], and has no limit after ARGV[7] sec so the
+# outliers are matched too. Returns user, joined_ms, rating triples,
+# ARGV[1] users per match in rating order.
+MATCH_SCRIPT = '''
+local size = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+
+-- Join times read during the pass
+local joined_times = {}
+local function joined_at(user)
+	local joined = joined_times[user]
+	if not joined then
+		joined = tonumber(string.match(redis.call('HGET', KEYS[2], user), ':(%d+)$'))
+		joined_times[user] = joined
+	end
+	return joined
+end
+
+local function window(joined)
+	local wait = math.max(now - joined, 0) / 1000
+	if wait >= tonumber(ARGV[7]) then
+		return math.huge
+	end
+	return math.min(tonumber(ARGV[3]) + tonumber(ARGV[4]) * wait, tonumber(ARGV[5]))
+end
+
+local function match(user, matched)
+	local rank = redis.call('ZRANK', KEYS[4], user)
+	local first = math.max(rank - size + 1, 0)
+	local neighbours = redis.call('ZRANGE', KEYS[4], first, rank + size - 1, 'WITHSCORES')
+	local count = #neighbours / 2
+
+	local best
+	local best_gap
+	for start = 1, count - size + 1 do
+		local gap = tonumber(neighbours[2 * (start + size - 1)]) - tonumber(neighbours[2 * start])
+		if not best_gap or gap < best_gap then
+			for i = start, start + size - 1 do
+				if gap <= window(joined_at(neighbours[2 * i - 1])) then
+					best = start
+					best_gap = gap
+					break
+				end
+			end
+		end
+	end
+
+	if not best then
+		return false
+	end
+
+	for i = best, best + size - 1 do
+		local neighbour = neighbours[2 * i - 1]
+		matched[#matched + 1] = neighbour
+		matched[#matched + 1] = joined_at(neighbour)
+		matched[#matched + 1] = neighbours[2 * i]
+		redis.call('HDEL', KEYS[2], neighbour)
+		redis.call('ZREM', KEYS[4], neighbour)
+	end
+	return true
+end
+
+local matched = {}
+local dead = 0  -- leading entries no longer queued, trimmed after the pass
+local alive = false
+
+local limit = tonumber(ARGV[6])
+local cursor = tonumber(redis.call('GET', KEYS[5]) or '0')
+local entries = redis.call('LRANGE', KEYS[1], cursor, cursor + limit - 1)
+if cursor > 0 then
+	alive = true  -- Not scanning the front of the list
+end
+
+for _, entry in ipairs(entries) do
+	local user, seq = string.match(entry, '^(%d+):(%d+)$')
+	local value = redis.call('HGET', KEYS[2], user)
+	local queued = value and string.match(value, '^(%d+):') == seq
+
+	if queued then
+		queued = not match(user, matched)
+	end
+
+	if queued then
+		alive = true
+	elseif not alive then
+		dead = dead + 1
+	end
+end
+
+local next_cursor = 0
+if #entries == limit then
+	next_cursor = cursor + limit - dead
+end
+redis.call('SET', KEYS[5], next_cursor)
+
+if dead > 0 then
+	redis.call('LTRIM', KEYS[1], dead, -1)
+end
+return matched
+'''
+
+CANCEL_SCRIPT = '''
+redis.call('ZREM', KEYS[4], ARGV[1])
+return redis.call('HDEL', KEYS[2], ARGV[1])
+'''
+
+# Put matched users back in front of the queue, in their order and with
+# their join time. ARGV holds user, joined_ms, rating triples.
+REQUEUE_SCRIPT = '''
+for i = #ARGV - 2, 1, -3 do
+	if redis.call('HEXISTS', KEYS[2], ARGV[i]) == 0 then
+		local seq = redis.call('INCR', KEYS[3])
+		redis.call('HSET', KEYS[2], ARGV[i], seq .. ':' .. ARGV[i + 1])
+		redis.call('LPUSH', KEYS[1], ARGV[i] .. ':' .. seq)
+		redis.call('ZADD', KEYS[4], ARGV[i + 2], ARGV[i])
+	end
+end
+return 1
+'''
+
+# Join time of the user waiting for the longest time, the tombstones in
+# front of it are dropped and the cursor of the passes moved back as much
+OLDEST_SCRIPT = '''
+local popped = 0
+local oldest = false
+while true do
+	local entry = redis.call('LINDEX', KEYS[1], 0)
+	if not entry then
+		break
+	end
+
+	local user, seq = string.match(entry, '^(%d+):(%d+)$')
+	local value = redis.call('HGET', KEYS[2], user)
+	if value then
+		local live_seq, joined = string.match(value, '^(%d+):(%d+)$')
+		if live_seq == seq then
+			oldest = joined
+			break
+		end
+	end
+	redis.call('LPOP', KEYS[1])
+	popped = popped + 1
+end
+
+if popped > 0 then
+	local cursor = tonumber(redis.call('GET', KEYS[5]) or '0')
+	if cursor > 0 then
+		redis.call('SET', KEYS[5], math.max(cursor - popped, 0))
+	end
+end
+return oldest
+'''
+
+
+def now_ms():
+	return int(time.time() * 1000)
+
+
+class MatchmakingQueue:
+	'''
+	Matchmaking queue shared by every process through Redis.
+
+	The users wait in a list in their join order, with a hash indexing the
+	queued users and their join time, and a sorted set of their ratings.
+	Pushing, matching and cancelling are Lua scripts, so two matchers in
+	different workers can never match the same users.
+
+	The matches are formed by passes over the queue, oldest users first, run
+	by the Matchmaker. A user is matched with the users closest in rating,
+	found from its rank in the sorted set, when their rating gap fits in the
+	window of one of them. The window widens with the wait
+	(RATING_WINDOW_GROWTH), trading match quality for shorter waits, up to
+	RATING_WINDOW_MAX. After MATCH_MAX_WAIT it has no limit, a user whose
+	rating is far from everyone else's is matched with the closest ones.
+	Joining and cancelling never scan the queue: a match or a cancel only
+	removes the users from the index and the sorted set, leaving tombstones
+	in the list that are dropped later.
+
+	The wait of each matched user goes to a histogram shared by the nodes.
+	'''
+
+	def __init__(self, queue_type, name=None, window=RATING_WINDOW, window_growth=RATING_WINDOW_GROWTH, window_max=RATING_WINDOW_MAX, max_wait=MATCH_MAX_WAIT):
+		self.queue_type = queue_type
+		self.size = QUEUE_SIZES[queue_type]
+		self.window = window
+		self.window_growth = window_growth
+		self.window_max = window_max
+		self.max_wait = max_wait
+
+		# Queues of the same type can be kept apart by their name, for benchmarks
+		name = name or queue_type
+		self.queue_key = f'matchmaking:{name}:queue'
+		self.index_key = f'matchmaking:{name}:users'
+		self.waits_key = f'matchmaking:{name}:waits'
+		self.ratings_key = f'matchmaking:{name}:ratings'
+		self.keys = [
+			self.queue_key,
+			self.index_key,
+			f'matchmaking:{name}:seq',
+			self.ratings_key,
+			f'matchmaking:{name}:cursor',
+		]
+		self.redis = get_redis_connection('default')
+
+		self.push_script = self.redis.register_script(PUSH_SCRIPT)
+		self.match_script = self.redis.register_script(MATCH_SCRIPT)
+		self.cancel_script = self.redis.register_script(CANCEL_SCRIPT)
+		self.requeue_script = self.redis.register_script(REQUEUE_SCRIPT)
+		self.oldest_script = self.redis.register_script(OLDEST_SCRIPT)
+
+
+	def push(self, user_id, rating, now=None):
+		''' False when the user was already queued. '''
+		now = now if now is not None else now_ms()
+		return bool(self.push_script(keys=self.keys, args=[user_id, now, QUEUE_TOMBSTONE_SLACK, rating]))
+
+
+	def match(self, now=None, limit=MATCH_SCAN_LIMIT):
+		'''
+		Form all the matches possible among the `limit` oldest users, as
+		user id -> (join time in ms, rating) dicts.
+		'''
+		now = now if now is not None else now_ms()
+		result = self.match_script(
+			keys=self.keys,
+			args=[self.size, now, self.window, self.window_growth, self.window_max, limit, self.max_wait]
+		)
+
+		group = self.size * 3
+		matches = [
+			{
+				int(result[i]): (int(result[i + 1]), float(result[i + 2]))
+				for i in range(first, first + group, 3)
+			}
+			for first in range(0, len(result), group)
+		]
+
+		if matches:
+			try:
+				self.record_waits([joined for users in matches for joined, _ in users.values()], now)
+			except Exception as e:
+				# The users are already matched, the matches go on
+				logger.error(f'Cannot record the waits of the {self.queue_type} queue: {e}')
+		return matches
+
+
+	def cancel(self, user_id):
+		''' False when the user was not queued, already matched for instance. '''
+		return bool(self.cancel_script(keys=self.keys, args=[user_id]))
+
+
+	def requeue(self, matches):
+		''' Give back the users of matches that could not be created. '''
+		args = []
+		for users in matches:
+			for user_id, (joined, rating) in users.items():
+				args += [user_id, joined, rating]
+		self.requeue_script(keys=self.keys, args=args)
+
+
+	def __contains__(self, user_id):
+		return bool(self.redis.hexists(self.index_key, user_id))
+
+
+	def __len__(self):
+		return self.redis.hlen(self.index_key)
+
+
+	def record_waits(self, joined_times, now):
+		counts = Counter()
+		total = 0
+		for joined in joined_times:
+			wait = max(now - joined, 0)
+			counts[next((f'{bound}' for bound in WAIT_BUCKETS if wait <= bound * 1000), '+Inf')] += 1
+			total += wait
+
+		pipeline = self.redis.pipeline(transaction=False)
+		pipeline.hincrby(self.waits_key, 'matched', sum(counts.values()))
+		pipeline.hincrby(self.waits_key, 'wait_ms', total)
+		for bucket, count in counts.items():
+			pipeline.hincrby(self.waits_key, bucket, count)
+		pipeline.execute()
+
+
+	def stats(self):
+		oldest = self.oldest_script(keys=self.keys)
+		waits = {key.decode(): int(value) for key, value in self.redis.hgetall(self.waits_key).items()}
+		matched = waits.get('matched', 0)
+
+		# Cumulative counts per bucket upper bound in sec, like Prometheus
+		buckets = {}
+		cumulative = 0
+		for bound in WAIT_BUCKETS + ('+Inf',):
+			cumulative += waits.get(f'{bound}', 0)
+			buckets[f'{bound}'] = cumulative
+
+		return {
+			'queued': len(self),
+			'oldest_wait': (now_ms() - int(oldest)) / 1000 if oldest is not None else None,
+			'matched': matched,
+			'mean_wait': waits.get('wait_ms', 0) / matched / 1000 if matched else None,
+			'waits': buckets,
+		}
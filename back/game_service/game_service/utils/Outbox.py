@@ -0,0 +1,72 @@
+import logging
+import asyncio
+
+from collections import deque
+
+from .defines import *
+
+logger = logging.getLogger(__name__)
+
+class Outbox:
+	'''
+	Bounded queue of the frames going out to one consumer, drained by its
+	own writer task so a slow client never delays the other ones nor the
+	game loop.
+
+	When the client falls behind and the queue is full the oldest frame is
+	dropped, the latest state always wins.
+	'''
+
+	def __init__(self, send, size=OUTBOX_SIZE):
+		self.send = send
+		self.size = size
+
+		self.queue = deque()
+		self.event = None
+		self.task = None
+
+		self.sent = 0
+		self.dropped = 0
+
+
+	def put(self, text_data=None, bytes_data=None):
+		if len(self.queue) >= self.size:
+			self.queue.popleft()
+			self.dropped += 1
+
+		self.queue.append((text_data, bytes_data))
+
+		if self.task is None:
+			self.event = asyncio.Event()
+			self.task = asyncio.create_task(self.run())
+
+		self.event.set()
+
+
+	async def run(self):
+		while True:
+			await self.event.wait()
+			self.event.clear()
+
+			while self.queue:
+				text_data, bytes_data = self.queue.popleft()
+				try:
+					await self.send(text_data=text_data, bytes_data=bytes_data)
+					self.sent += 1
+				except Exception as e:
+					logger.error(f'error while sending a frame: {e}')
+
+
+	def close(self):
+		if self.task is not None:
+			self.task.cancel()
+			self.task = None
+		self.queue.clear()
+
+
+	def stats(self):
+		return {
+			'queued': len(self.queue),
+			'sent': self.sent,
+			'dropped': self.dropped,
+		}
@@ -1,6 +1,8 @@
 import typing
 import logging
 
+from collections import deque
+
 from .defines import *
 from .Vector import Vector2
 
@@ -12,14 +14,60 @@ class Player:
         self.movement = 'NONE'
         self.score = 0
 
+        # Sequenced inputs sent by the client, the ones pending are all
+        # applied at the next tick
+        self.inputs = deque()
+        self.last_queued_seq = 0
+        self.coalesced_inputs = 0
+        self.dropped_inputs = 0  # Oldest pending ones past MAX_PENDING_INPUTS
+
+        # Last input applied, echoed in the frames for client reconciliation
+        self.input_seq = 0
+        self.input_tick = 0
+
     def setMovement(self, movement):
         if movement != "UP" and movement != "DOWN" and movement != "NONE":
             raise ValueError(f"Invalid movement: {movement}")
         
         self.movement = movement
 
+    def queue_input(self, seq, movement, tick=None):
+        if movement != "UP" and movement != "DOWN" and movement != "NONE":
+            raise ValueError(f"Invalid movement: {movement}")
+
+        # Duplicated or reordered input, a newer one is already queued
+        if seq <= self.last_queued_seq:
+            return
+
+        if tick is not None and self.inputs and self.inputs[-1][1] == tick:
+            # Same client tick, only the last movement of the tick matters
+            # (unknown when the client does not send its tick)
+            self.inputs[-1] = (seq, tick, movement)
+            self.coalesced_inputs += 1
+        else:
+            if len(self.inputs) >= MAX_PENDING_INPUTS:
+                # Counting down, the inputs wait for the start
+                self.inputs.popleft()
+                self.dropped_inputs += 1
+            self.inputs.append((seq, tick, movement))
+        self.last_queued_seq = seq
+
+    def apply_input(self):
+        '''
+        Apply the inputs queued since the last tick, at a tick boundary: a
+        burst is not spread over the next ticks, the last movement wins and
+        the highest seq is echoed.
+        '''
+        seq, tick, movement = self.inputs[-1]
+        self.coalesced_inputs += len(self.inputs) - 1
+        self.inputs.clear()
+
+        self.movement = movement
+        self.input_seq = seq
+        self.input_tick = tick if tick is not None else 0
+
     def move(self):
-        speed = PADDLE_SPEED
+        speed = PADDLE_SPEED * TICK_SCALE
         if self.movement == "UP":
             self.position.y -= speed
             if self.position.y < -300 + PADDLE_HEIGHT / 2:
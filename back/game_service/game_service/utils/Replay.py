@@ -0,0 +1,138 @@
+import struct
+
+from .defines import *
+
+# Replay file, little endian:
+#   header  4s magic, B version, B engine (see ENGINES), Q seed, B user count
+#   users   I user id, B initial score, for each user in joining order
+#   events  varint ticks since the previous event, B event code
+#
+# The event code packs the event type in its high nibble, then the index of
+# the user in the header (1 bit) and the movement (2 bits).
+REPLAY_MAGIC = b'PRPL'
+REPLAY_VERSION = 2
+
+HEADER_STRUCT = struct.Struct('<4sBBQB')
+USER_STRUCT = struct.Struct('<IB')
+
+ENGINES = ['python', 'numpy']
+MOVEMENT_CODES = ['NONE', 'UP', 'DOWN']
+
+EVENT_MOVE = 0
+EVENT_PAUSE = 1
+EVENT_UNPAUSE = 2
+EVENT_QUIT = 3
+EVENT_END = 15
+
+class ReplayError(Exception):
+	pass
+
+
+class ReplayRecorder:
+	'''
+	Input log of a started game: its seed, then the movement changes,
+	pauses and quits with the tick they happened at. The game is fully
+	determined by them, a whole match takes a few hundred bytes where the
+	frames would take hundreds of kilobytes.
+
+	Game.tick and the BatchEngine call capture() at the start of each step,
+	once the inputs of the step are applied.
+	'''
+
+	def __init__(self, game, seed, engine='python'):
+		self.users = list(game.users.values())
+		self.data = bytearray(HEADER_STRUCT.pack(
+			REPLAY_MAGIC, REPLAY_VERSION, ENGINES.index(engine), seed, len(self.users)
+		))
+		for user in self.users:
+			self.data += USER_STRUCT.pack(user.id, user.score)
+
+		self.movements = ['NONE'] * len(self.users)
+		self.paused = False
+		self.last_tick = 0
+		self.ended = False
+
+
+	def add_event(self, tick, event, index=0, movement=0):
+		delta = tick - self.last_tick
+		self.last_tick = tick
+
+		# Unsigned LEB128 varint
+		while delta >= 0x80:
+			self.data.append((delta & 0x7f) | 0x80)
+			delta >>= 7
+		self.data.append(delta)
+
+		self.data.append((event << 4) | (index << 2) | movement)
+
+
+	def capture(self, game):
+		tick = game.ticks
+
+		for index, user in enumerate(self.users):
+			if user.movement != self.movements[index]:
+				self.movements[index] = user.movement
+				self.add_event(tick, EVENT_MOVE, index, MOVEMENT_CODES.index(user.movement))
+
+		paused = game.status == 'paused'
+		if paused != self.paused:
+			self.paused = paused
+			self.add_event(tick, EVENT_PAUSE if paused else EVENT_UNPAUSE)
+
+
+	def record_quit(self, game, winner_id):
+		''' A user quit and the other one wins. '''
+		for index, user in enumerate(self.users):
+			if user.id == winner_id:
+				self.add_event(game.ticks, EVENT_QUIT, index)
+
+
+	def end(self, game):
+		if not self.ended:
+			self.ended = True
+			self.add_event(game.ticks, EVENT_END)
+
+
+	def to_bytes(self):
+		return bytes(self.data)
+
+
+def decode_replay(data):
+	''' Return the header of the replay and its events as (tick, type, index, movement). '''
+	data = bytes(data)
+	if len(data) < HEADER_STRUCT.size:
+		raise ReplayError('replay too short')
+
+	magic, version, engine, seed, user_count = HEADER_STRUCT.unpack_from(data)
+	if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+		raise ReplayError('not a replay or unsupported version')
+
+	offset = HEADER_STRUCT.size
+	users = []
+	for _ in range(user_count):
+		users.append(USER_STRUCT.unpack_from(data, offset))
+		offset += USER_STRUCT.size
+
+	events = []
+	tick = 0
+	while offset < len(data):
+		delta = shift = 0
+		while True:
+			byte = data[offset]
+			offset += 1
+			delta |= (byte & 0x7f) << shift
+			shift += 7
+			if byte < 0x80:
+				break
+
+		code = data[offset]
+		offset += 1
+		tick += delta
+		events.append((tick, code >> 4, (code >> 2) & 1, code & 3))
+
+	header = {
+		'engine': ENGINES[engine],
+		'seed': seed,
+		'users': users,
+	}
+	return header, events
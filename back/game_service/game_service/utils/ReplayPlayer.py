@@ -0,0 +1,98 @@
+import random
+
+from .Game import Game
+from .BatchEngine import BatchEngine
+from .TimerWheel import TimerWheel
+from .Replay import *
+from .defines import *
+
+class ReplayPlayer:
+	'''
+	Rebuilds a recorded game offline, as fast as the physics allows.
+
+	The game is stepped with the engine it was recorded with when it is
+	available (numpy and Python floats may differ in the last bits).
+	'''
+
+	def __init__(self, data, engine=None):
+		self.header, self.events = decode_replay(data)
+
+		self.timers = TimerWheel()
+		self.game = Game(rng=random.Random(self.header['seed']), timers=self.timers)
+		for user_id, score in self.header['users']:
+			self.game.add_user(user_id=user_id)
+			self.game.users[user_id].score = score
+		self.game.status = 'started'
+
+		self.users = list(self.game.users.values())
+		self.next_event = 0
+
+		self.engine = engine
+		if self.engine is None and self.header['engine'] == 'numpy' and BatchEngine.available:
+			self.engine = BatchEngine(capacity=1)
+
+		if self.engine is not None:
+			self.engine.add_game(self.game)
+
+
+	def apply_events(self):
+		game = self.game
+		events = self.events
+
+		while self.next_event < len(events) and events[self.next_event][0] <= game.ticks:
+			tick, event, index, movement = events[self.next_event]
+			self.next_event += 1
+
+			if event == EVENT_MOVE:
+				self.users[index].movement = MOVEMENT_CODES[movement]
+			elif event == EVENT_PAUSE:
+				game.start_pause()
+			elif event == EVENT_UNPAUSE:
+				game.end_pause()
+			elif event == EVENT_QUIT:
+				winner = self.users[index]
+				game.winner_id = winner.id
+				winner.score = POINTS_TO_WIN
+				game.status = 'finished'
+			elif event == EVENT_END:
+				game.status = 'finished'
+
+
+	def step(self):
+		self.apply_events()
+		game = self.game
+		if game.status == 'finished':
+			return False
+
+		# Same order as the Scheduler, the timers fire before the step
+		self.timers.advance()
+
+		if self.engine is not None and game.status == 'started':
+			self.engine.step([game])
+		else:
+			game.tick()
+
+		return game.status != 'finished'
+
+
+	def run(self):
+		''' Play the whole replay, return the final game. '''
+		while self.step():
+			pass
+
+		if self.engine is not None:
+			self.engine.remove_game(self.game)
+		return self.game
+
+
+	def frames(self, every=TICK_RATE // BROADCAST_RATE):
+		''' Yield the state seen from the right side every `every` ticks. '''
+		running = True
+		while running:
+			running = self.step()
+			if self.game.ticks % every == 0 or not running:
+				if self.engine is not None:
+					self.engine.store_positions([self.game])
+				state = self.game.get_side_state('right')
+				state['tick'] = self.game.ticks
+				yield state
@@ -0,0 +1,161 @@
+import logging
+import asyncio
+
+from channels.db import database_sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from game_service.models import GameModel, ScoreModel, ReplayModel, RatingModel
+from .rating import rate_game, cache_ratings
+from .defines import *
+
+logger = logging.getLogger(__name__)
+
+class ResultWriter:
+	'''
+	Write-behind persistence of the game results.
+
+	Game.save_game only queues the result and returns, so the final frame
+	is not held by the database. A single task per process writes the
+	results queued during RESULT_BATCH_DELAY together, in one transaction:
+	a select of the games, a bulk insert of the scores and replays, and a
+	bulk update of the games. A failed batch is retried with a growing
+	delay, the inserts ignore the rows written by a previous attempt.
+
+	The Elo ratings of the players of the finished games are updated in
+	the same transaction, so a game is only rated once, and cached for the
+	matchmaking once committed.
+	'''
+
+	_instance = None
+
+	def __new__(cls, *args, **kwargs):
+		if not cls._instance:
+			cls._instance = super(ResultWriter, cls).__new__(cls, *args, **kwargs)
+			cls._instance.pending = []
+			cls._instance.task = None
+			cls._instance.written = 0
+			cls._instance.failed = 0
+			cls._instance.batches = 0
+			cls._instance.retries = 0
+		return cls._instance
+
+
+	def submit(self, game_id, winner_id, scores, replay=None):
+		'''
+		Queue the result of a game, `scores` maps the user ids to their
+		score, `replay` is (ticks, data) when the game was recorded.
+		'''
+		self.pending.append({
+			'game_id': game_id,
+			'winner_id': winner_id,
+			'scores': scores,
+			'replay': replay,
+		})
+
+		if self.task is None or self.task.done():
+			self.task = asyncio.create_task(self.run())
+
+
+	async def run(self):
+		while self.pending:
+			# Gather the games finishing at the same time in the same batch
+			await asyncio.sleep(RESULT_BATCH_DELAY)
+
+			batch = self.pending[:RESULT_BATCH_SIZE]
+			del self.pending[:RESULT_BATCH_SIZE]
+			await self.write(batch)
+
+
+	async def write(self, batch):
+		delay = RESULT_RETRY_DELAY
+		for attempt in range(RESULT_MAX_ATTEMPTS):
+			try:
+				await database_sync_to_async(self.write_batch)(batch)
+				self.batches += 1
+				self.written += len(batch)
+				return
+			except Exception as e:
+				logger.error(f'Cannot save {len(batch)} games (attempt {attempt + 1}): {e}')
+
+			if attempt + 1 < RESULT_MAX_ATTEMPTS:
+				self.retries += 1
+				await asyncio.sleep(delay)
+				delay *= 2
+
+		self.failed += len(batch)
+		logger.error(f'Results of games {[result["game_id"] for result in batch]} lost')
+
+
+	@staticmethod
+	def write_batch(batch):
+		with transaction.atomic():
+			games = GameModel.objects.in_bulk([result['game_id'] for result in batch])
+
+			scores = []
+			replays = []
+			rated = []
+			for result in batch:
+				game = games.get(result['game_id'])
+				if game is None:
+					logger.error(f'Game {result["game_id"]} does not exist')
+					continue
+
+				if game.status != 'finished' and len(result['scores']) == 2 and result['winner_id'] in result['scores']:
+					rated.append(result)
+
+				game.winner_id = result['winner_id']
+				game.status = 'finished'
+
+				for user_id, score in result['scores'].items():
+					scores.append(ScoreModel(game_id=game.id, user_id=user_id, score=score))
+
+				if result['replay'] is not None:
+					ticks, data = result['replay']
+					replays.append(ReplayModel(game_id=game.id, ticks=ticks, data=data))
+
+			ScoreModel.objects.bulk_create(scores, ignore_conflicts=True)
+			ReplayModel.objects.bulk_create(replays, ignore_conflicts=True)
+			GameModel.objects.bulk_update(list(games.values()), ['winner_id', 'status'])
+
+			if rated:
+				ResultWriter.rate_games(rated)
+
+
+	@staticmethod
+	def rate_games(results):
+		user_ids = {user_id for result in results for user_id in result['scores']}
+		ratings = RatingModel.objects.select_for_update().in_bulk(user_ids, field_name='user_id')
+
+		new_ratings = {}
+		for user_id in user_ids - ratings.keys():
+			new_ratings[user_id] = ratings[user_id] = RatingModel(user_id=user_id)
+
+		# In the order of the batch, when a user finished several games
+		for result in results:
+			winner_id = result['winner_id']
+			loser_id = next(user_id for user_id in result['scores'] if user_id != winner_id)
+			rate_game(ratings[winner_id], ratings[loser_id])
+
+		RatingModel.objects.bulk_create(list(new_ratings.values()))
+
+		# bulk_update does not set the auto_now fields
+		updated = [rating for user_id, rating in ratings.items() if user_id not in new_ratings]
+		now = timezone.now()
+		for rating in updated:
+			rating.updated_at = now
+		RatingModel.objects.bulk_update(updated, ['rating', 'games', 'updated_at'])
+
+		transaction.on_commit(lambda: cache_ratings({
+			user_id: rating.rating for user_id, rating in ratings.items()
+		}))
+
+
+	def stats(self):
+		return {
+			'pending': len(self.pending),
+			'written': self.written,
+			'failed': self.failed,
+			'batches': self.batches,
+			'retries': self.retries,
+		}
@@ -0,0 +1,229 @@
+import logging
+import asyncio
+import time
+
+from .TimerWheel import TimerWheel
+from .TickProfiler import TickProfiler
+from .defines import *
+
+logger = logging.getLogger(__name__)
+
+class Scheduler:
+	'''
+	Fixed-rate loop shared by every live game of the process.
+
+	Each tick steps all the registered games, then flushes their
+	network output in a single pass.
+
+	In fixed timestep mode the time spent outside of the physics (sending
+	frames, other coroutines) is accumulated and paid back with extra
+	physics steps, so the simulation keeps its rate under load.
+
+	The physics runs at TICK_RATE while the frames are only sent at
+	BROADCAST_RATE, so collisions stay accurate without paying for more
+	outbound frames.
+
+	When a BatchEngine is given, the started games are stepped together by
+	the engine and Game.tick() is only used for the other states.
+
+	The timers of the games (countdown, pause, ball serve) live in a single
+	TimerWheel advanced at the start of each step.
+
+	The time spent in each phase of the steps and broadcasts goes to the
+	TickProfiler.
+	'''
+
+	def __init__(self, tick_rate=TICK_RATE, broadcast_rate=BROADCAST_RATE, fixed_timestep=FIXED_TIMESTEP, max_catch_up_steps=MAX_CATCH_UP_STEPS, engine=None, profiler=None):
+		self.tick_rate = tick_rate
+		self.tick_duration = 1 / tick_rate
+		self.steps_per_broadcast = max(round(tick_rate / broadcast_rate), 1)
+		self.fixed_timestep = fixed_timestep
+		self.max_catch_up_steps = max_catch_up_steps
+		self.engine = engine
+		self.timers = TimerWheel()
+		self.profiler = profiler if profiler is not None else TickProfiler('off')
+
+		# game -> future resolved when the game is finished
+		self.games = {}
+		self.task = None
+
+		self.ticks = 0
+		self.steps = 0
+		self.broadcasts = 0
+		self.overruns = 0  # ticks that took longer than the tick duration
+		self.catch_up_steps = 0  # extra steps run to recover from a late tick
+		self.dropped_steps = 0  # steps given up when too far behind
+
+
+	async def run_game(self, game):
+		''' Register the game and wait until it is finished. '''
+		future = asyncio.get_running_loop().create_future()
+		self.games[game] = future
+
+		if self.engine is not None and self.engine.supports(game):
+			self.engine.add_game(game)
+
+		if self.task is None or self.task.done():
+			self.task = asyncio.create_task(self.run())
+
+		await future
+
+
+	def remove_game(self, game, exception=None):
+		future = self.games.pop(game, None)
+
+		if self.engine is not None:
+			self.engine.remove_game(game)
+
+		if future is None or future.done():
+			return
+
+		if exception is not None:
+			future.set_exception(exception)
+		else:
+			future.set_result(None)
+
+
+	def stats(self):
+		return {
+			'games': len(self.games),
+			'ticks': self.ticks,
+			'steps': self.steps,
+			'broadcasts': self.broadcasts,
+			'overruns': self.overruns,
+			'catch_up_steps': self.catch_up_steps,
+			'dropped_steps': self.dropped_steps,
+			'timers': self.timers.stats(),
+		}
+
+
+	def step(self, games):
+		phases = self.profiler.sample_step()
+		if phases is not None:
+			start = time.perf_counter()
+
+		self.timers.advance()
+
+		if phases is not None:
+			phases['timers'] = time.perf_counter() - start
+
+		batch = []
+		for game in games:
+			if game.status == 'finished' or game not in self.games:
+				continue
+
+			if self.engine is not None and game.status == 'started' and game in self.engine.slots:
+				batch.append(game)
+				continue
+
+			try:
+				game.tick(phases)
+			except Exception as e:
+				logger.error(f'error while stepping game {game.game_id}: {e}')
+				self.remove_game(game, e)
+
+		if batch:
+			if phases is not None:
+				engine_start = time.perf_counter()
+
+			try:
+				self.engine.step(batch)
+			except Exception as e:
+				logger.error(f'error while stepping the batch engine: {e}')
+				for game in batch:
+					self.remove_game(game, e)
+
+			if phases is not None:
+				phases['engine'] = time.perf_counter() - engine_start
+
+		self.steps += 1
+
+		if phases is not None:
+			phases['step'] = time.perf_counter() - start
+			self.profiler.commit(phases)
+
+
+	async def run(self):
+		accumulator = self.tick_duration
+		last_time = time.monotonic()
+		pending_steps = 0
+
+		while self.games:
+			tick_start = time.monotonic()
+			games = list(self.games)
+
+			if self.fixed_timestep:
+				accumulator += tick_start - last_time
+				last_time = tick_start
+
+				steps = 0
+				while accumulator >= self.tick_duration and steps < self.max_catch_up_steps:
+					self.step(games)
+					accumulator -= self.tick_duration
+					steps += 1
+
+				if steps > 1:
+					self.catch_up_steps += steps - 1
+
+				pending_steps += steps
+
+				if accumulator >= self.tick_duration:
+					# Too far behind, the missed time is lost for good
+					dropped = int(accumulator / self.tick_duration)
+					self.dropped_steps += dropped
+					accumulator -= dropped * self.tick_duration
+
+			else:
+				self.step(games)
+				pending_steps += 1
+
+			self.remove_finished_games(games)
+
+			if pending_steps >= self.steps_per_broadcast:
+				pending_steps = 0
+				await self.flush(games)
+
+			self.ticks += 1
+
+			now = time.monotonic()
+			if now - tick_start > self.tick_duration:
+				self.overruns += 1
+			self.profiler.record('tick', now - tick_start)
+
+			if self.fixed_timestep:
+				delay = self.tick_duration - accumulator - (now - last_time)
+			else:
+				delay = self.tick_duration - (now - tick_start)
+
+			await asyncio.sleep(max(delay, 0))
+
+
+	def remove_finished_games(self, games):
+		for game in games:
+			if game.status == 'finished':
+				self.remove_game(game)
+
+
+	async def flush(self, games):
+		running = [game for game in games if game in self.games]
+		self.broadcasts += 1
+
+		phases = self.profiler.sample_flush()
+		if phases is not None:
+			start = time.perf_counter()
+
+		if self.engine is not None:
+			self.engine.store_positions(running)
+
+		results = await asyncio.gather(
+			*(game.notify_users(phases) for game in running),
+			return_exceptions=True
+		)
+
+		if phases is not None:
+			phases['flush'] = time.perf_counter() - start
+			self.profiler.commit(phases)
+
+		for game, result in zip(running, results):
+			if isinstance(result, Exception):
+				logger.error(f'error while notifying game {game.game_id}: {result}')
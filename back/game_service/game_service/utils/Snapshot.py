@@ -0,0 +1,52 @@
+import json
+import time
+
+from .frames import pack_state
+
+class Snapshot:
+	'''
+	State of a game at one tick, shared by all the consumers of the game.
+
+	The state is built at most once per side (each player sees the game
+	from the right side, so the left player gets the x coordinates
+	mirrored) and encoded at most once per side and protocol, so every
+	consumer of a side receives the same str or bytes object.
+
+	Frames carry the server time in milliseconds, so the clients can
+	interpolate between frames sent at a lower rate than the physics. The
+	time is added to the encoded frames only, the states stay equal while
+	the game does not change so idle delta frames are not sent.
+	'''
+
+	def __init__(self, game):
+		self.game = game
+		self.time = time.time() * 1000
+		self.states = {}
+		self.payloads = {}
+
+
+	def state(self, side):
+		if side not in self.states:
+			self.states[side] = self.game.get_side_state(side)
+		return self.states[side]
+
+
+	def prepare(self, side, protocol):
+		''' Build, and encode unless sent as deltas, the frame of a consumer. '''
+		if protocol == 'delta':
+			self.state(side)
+		else:
+			self.payload(side, protocol)
+
+
+	def payload(self, side, protocol):
+		key = (side, protocol)
+		if key not in self.payloads:
+			state = self.state(side)
+			if state is None:
+				self.payloads[key] = None
+			elif protocol == 'binary':
+				self.payloads[key] = pack_state(dict(state, time=self.time))
+			else:
+				self.payloads[key] = json.dumps(dict(state, time=self.time))
+		return self.payloads[key]
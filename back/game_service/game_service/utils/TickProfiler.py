@@ -0,0 +1,129 @@
+import bisect
+
+from .defines import *
+
+# Upper bounds of the histogram buckets, in sec, the last bucket is unbounded
+BUCKETS = (
+	0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+	0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+)
+
+# Phases of the game loop, see Scheduler.step, Scheduler.flush and Game.tick
+PHASES = (
+	'timers',  # firing the timer wheel
+	'players',  # inputs and paddle moves of the games stepped by Game.tick
+	'ball',  # ball moves of the games stepped by Game.tick
+	'collisions',  # collisions of the games stepped by Game.tick
+	'engine',  # whole BatchEngine step
+	'step',  # whole physics step
+	'state',  # building and encoding the frames
+	'notify',  # queueing the frames to the consumers
+	'flush',  # whole broadcast
+	'tick',  # whole loop iteration, steps and broadcast
+)
+
+class Histogram:
+	__slots__ = ('counts', 'count', 'total', 'max', 'over_budget')
+
+	def __init__(self):
+		self.counts = [0] * (len(BUCKETS) + 1)
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+		self.over_budget = 0
+
+
+	def record(self, seconds):
+		self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+		self.count += 1
+		self.total += seconds
+		if seconds > self.max:
+			self.max = seconds
+		if seconds > TICK_DURATION:
+			self.over_budget += 1
+
+
+	def export(self):
+		''' Cumulative counts per bucket upper bound in ms, like Prometheus. '''
+		buckets = {}
+		cumulative = 0
+		for bound, count in zip(BUCKETS + (None,), self.counts):
+			cumulative += count
+			buckets['+Inf' if bound is None else f'{bound * 1000:g}'] = cumulative
+
+		return {
+			'count': self.count,
+			'sum_ms': self.total * 1000,
+			'max_ms': self.max * 1000,
+			'over_budget': self.over_budget,
+			'buckets': buckets,
+		}
+
+
+class TickProfiler:
+	'''
+	Time spent in each phase of the game loop of the process, in fixed
+	bucket histograms.
+
+	In 'full' mode every step and broadcast is measured. In 'sampled' mode
+	only one out of PROFILE_SAMPLE_INTERVAL is, the others only cost a
+	counter increment, so it can stay on in production. The whole loop
+	iteration ('tick') is timed by the Scheduler anyway and always
+	recorded. 'off' measures nothing.
+
+	The durations of a measured pass are summed over its games, and
+	over_budget counts the passes longer than a tick.
+	'''
+
+	def __init__(self, mode='sampled', interval=PROFILE_SAMPLE_INTERVAL):
+		self.mode = mode
+		self.interval = 1 if mode == 'full' else interval
+		self.histograms = {phase: Histogram() for phase in PHASES}
+		self.steps = 0
+		self.flushes = 0
+
+
+	@property
+	def enabled(self):
+		return self.mode in ('full', 'sampled')
+
+
+	def sample_step(self):
+		''' Phase accumulator when the step is measured, None otherwise. '''
+		if not self.enabled:
+			return None
+
+		self.steps += 1
+		if self.steps % self.interval:
+			return None
+		return dict.fromkeys(PHASES, 0.0)
+
+
+	def sample_flush(self):
+		if not self.enabled:
+			return None
+
+		self.flushes += 1
+		if self.flushes % self.interval:
+			return None
+		return dict.fromkeys(PHASES, 0.0)
+
+
+	def commit(self, phases):
+		for phase, seconds in phases.items():
+			if seconds:
+				self.histograms[phase].record(seconds)
+
+
+	def record(self, phase, seconds):
+		if self.enabled:
+			self.histograms[phase].record(seconds)
+
+
+	def export(self):
+		return {
+			'mode': self.mode,
+			'interval': self.interval,
+			'budget_ms': TICK_DURATION * 1000,
+			'phases': {phase: histogram.export() for phase, histogram in self.histograms.items()},
+		}
@@ -0,0 +1,96 @@
+import logging
+
+from .defines import *
+
+logger = logging.getLogger(__name__)
+
+def seconds_to_ticks(seconds):
+	return max(round(seconds * TICK_RATE), 1)
+
+
+class Timer:
+	__slots__ = ('wheel', 'tick', 'callback', 'args', 'cancelled')
+
+	def __init__(self, wheel, tick, callback, args):
+		self.wheel = wheel
+		self.tick = tick
+		self.callback = callback
+		self.args = args
+		self.cancelled = False
+
+
+	def cancel(self):
+		self.cancelled = True
+
+
+	def remaining(self):
+		''' Seconds before the timer fires. '''
+		return max(self.tick - self.wheel.tick, 0) / TICK_RATE
+
+
+class TimerWheel:
+	'''
+	Timers counted in ticks, fired by the loop stepping the games.
+
+	A timer due at tick t is stored in the slot t % size, so advancing the
+	wheel only looks at the timers of one slot instead of every game
+	counting down its own timers. Timers more than a turn away stay in
+	their slot until their tick comes. Cancelled timers are dropped when
+	their slot is reached.
+
+	The Scheduler advances its wheel once per physics step, before stepping
+	the games, so a timer scheduled for `delay` ticks fires after exactly
+	`delay` steps whatever the event loop is doing, the same way in the
+	live games, the headless runner and the replays.
+	'''
+
+	def __init__(self, size=TIMER_WHEEL_SIZE):
+		self.size = size
+		self.slots = [[] for _ in range(size)]
+		self.tick = 0
+		self.pending = 0
+		self.fired = 0
+
+
+	def schedule(self, delay, callback, *args):
+		''' Call callback(*args) in `delay` ticks (at least one). '''
+		timer = Timer(self, self.tick + max(int(delay), 1), callback, args)
+		self.slots[timer.tick % self.size].append(timer)
+		self.pending += 1
+		return timer
+
+
+	def advance(self):
+		''' Move to the next tick and fire its timers. '''
+		self.tick += 1
+		index = self.tick % self.size
+		slot = self.slots[index]
+		if not slot:
+			return
+
+		due = []
+		later = []
+		for timer in slot:
+			(due if timer.tick <= self.tick else later).append(timer)
+
+		# Timers scheduled by the callbacks go to the new list
+		self.slots[index] = later
+		self.pending -= len(due)
+
+		for timer in due:
+			if timer.cancelled:
+				continue
+
+			self.fired += 1
+			try:
+				timer.callback(*timer.args)
+			except Exception as e:
+				logger.error(f'error in timer {timer.callback.__qualname__}: {e}')
+
+
+	def stats(self):
+		return {
+			'tick': self.tick,
+			'pending': self.pending,
+			'fired': self.fired,
+		}
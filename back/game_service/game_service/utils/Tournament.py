@@ -1,5 +1,6 @@
 import logging
 import asyncio
+import time
 import typing
 import math
 import httpx
@@ -23,9 +24,14 @@ class Tournament():
 
 		self.consumers = []
 
+		# Lifecycle, see TournamentManager.collect
+		self.finished_at = None
+		self.abandoned_at = None  # when the last consumer left
+
 
 	def add_user(self, consumer):
 		self.consumers.append(consumer)
+		self.abandoned_at = None
 		user_id = consumer.user_id
 
 		if user_id not in self.users:
@@ -38,9 +44,16 @@ class Tournament():
 		if user_id in self.users:
 			self.users.remove(user_id)
 
+		self.remove_consumer(consumer)
+
+
+	def remove_consumer(self, consumer):
 		if consumer in self.consumers:
 			self.consumers.remove(consumer)
 
+		if not self.consumers:
+			self.abandoned_at = time.monotonic()
+
 
 	async def notify_users(self, user_ids, message):
 		logger.info(f'users {user_ids}')
@@ -88,6 +101,10 @@ class Tournament():
 		logger.info(f'tournament finished')
 		await self.save_tournament()
 
+		self.status = 'finished'
+		self.finished_at = time.monotonic()
+		self.consumers = []
+
 
 	async def save_tournament(self):
 		try:
@@ -1,4 +1,13 @@
+import logging
+import asyncio
+import time
+
+from collections import Counter
+
 from .Tournament import Tournament
+from .defines import *
+
+logger = logging.getLogger(__name__)
 
 class TournamentManager:
 	_instance = None
@@ -7,6 +16,8 @@ class TournamentManager:
 		if not cls._instance:
 			cls._instance = super(TournamentManager, cls).__new__(cls, *args, **kwargs)
 			cls._instance.tournaments = {}
+			cls._instance.eviction_task = None
+			cls._instance.evicted = 0
 		return cls._instance
 
 
@@ -15,6 +26,9 @@ class TournamentManager:
 
 
 	def create_tournament(self, tournament_id):
+		if self.eviction_task is None or self.eviction_task.done():
+			self.eviction_task = asyncio.create_task(self.run_eviction())
+
 		if tournament_id not in self.tournaments:
 			tournament = Tournament(tournament_id)
 			self.tournaments[tournament_id] = tournament
@@ -22,3 +36,56 @@ class TournamentManager:
 
 		else:
 			return None  # Tournament already exists
+
+
+	def remove_tournament(self, tournament_id):
+		tournament = self.tournaments.pop(tournament_id, None)
+		if tournament is None:
+			return
+
+		tournament.consumers = []
+		self.evicted += 1
+
+
+	def collect(self, now=None):
+		'''
+		Evict the tournaments finished since FINISHED_GRACE, or still waiting
+		for players that left since ABANDON_GRACE. A started tournament runs
+		until its last game is over.
+		'''
+		now = time.monotonic() if now is None else now
+
+		evicted = self.evicted
+		for tournament_id, tournament in list(self.tournaments.items()):
+			finished = tournament.finished_at is not None and now - tournament.finished_at >= FINISHED_GRACE
+			abandoned = (
+				tournament.status == 'waiting'
+				and tournament.abandoned_at is not None
+				and now - tournament.abandoned_at >= ABANDON_GRACE
+			)
+
+			if finished or abandoned:
+				self.remove_tournament(tournament_id)
+
+		return self.evicted - evicted
+
+
+	async def run_eviction(self):
+		while self.tournaments:
+			await asyncio.sleep(EVICTION_INTERVAL)
+
+			try:
+				evicted = self.collect()
+				if evicted:
+					logger.info(f'{evicted} tournaments evicted, {len(self.tournaments)} left')
+			except Exception as e:
+				logger.error(f'error while evicting the tournaments: {e}')
+
+
+	def stats(self):
+		return {
+			'tournaments': len(self.tournaments),
+			'statuses': dict(Counter(tournament.status for tournament in self.tournaments.values())),
+			'consumers': sum(len(tournament.consumers) for tournament in self.tournaments.values()),
+			'evicted': self.evicted,
+		}
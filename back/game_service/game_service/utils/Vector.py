@@ -2,12 +2,12 @@ import math
 import random
 import logging
 
-def generate_vector():
-    number = random.uniform(-0.5, 0.5)
+def generate_vector(rng=random):
+    number = rng.uniform(-0.5, 0.5)
     return Vector2(1, number).normalize()
 
-def generate_vector_in_direction(direction):
-    number = random.uniform(-0.5, 0.5)
+def generate_vector_in_direction(direction, rng=random):
+    number = rng.uniform(-0.5, 0.5)
 
     if direction == 'left':
         return Vector2(-1, number).normalize()
@@ -17,6 +17,8 @@ def generate_vector_in_direction(direction):
         return Vector2(1, number).normalize()
 
 class Vector2:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -30,6 +32,24 @@ class Vector2:
     def __sub__(self, other):
         return Vector2(self.x - other.x, self.y - other.y)
 
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+        return self
+
+    def copy(self):
+        return Vector2(self.x, self.y)
+
     def length(self):
         return math.sqrt(self.x ** 2 + self.y ** 2)
 
@@ -43,12 +63,29 @@ class Vector2:
     def scale(self, scalar):
         return Vector2(self.x * scalar, self.y * scalar)
 
+    def scale_ip(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    def add_scaled(self, other, scalar):
+        """In place `self += other * scalar`, without temporary vector."""
+        self.x += other.x * scalar
+        self.y += other.y * scalar
+        return self
+
     def dot(self, other):
         return self.x * other.x + self.y * other.y
 
     def distance_to(self, other):
-        return (self - other).length()
+        return math.hypot(self.x - other.x, self.y - other.y)
 
     def reflect(self, normal):
         dot_product = self.dot(normal)
-        return self - normal.scale(2 * dot_product)
\ No newline at end of file
+        return self - normal.scale(2 * dot_product)
+
+    def reflect_ip(self, normal):
+        dot_product = 2 * self.dot(normal)
+        self.x -= normal.x * dot_product
+        self.y -= normal.y * dot_product
+        return self
@@ -2,5 +2,12 @@ from .jwt import create_jwt
 
 from .Game import Game
 from .GameManager import GameManager
+from .GameLease import GameLease, LeaseLostError
+from .MatchmakingQueue import MatchmakingQueue
+from .Matchmaker import Matchmaker
+from .ResultWriter import ResultWriter
+from .Scheduler import Scheduler
+from .DeltaEncoder import DeltaEncoder
+from .Outbox import Outbox
 from .Tournament import Tournament
 from .TournamentManager import TournamentManager
\ No newline at end of file
@@ -13,6 +13,7 @@ BALL_SPEED_INCREMENT: float = .3
 BALL_BASE_POSITION: List[int] = [400 - 2, 300 - 2]
 BALL_MIN_SIN: float = 0.2
 BALL_MAX_SIN: float = 0.8
+BALL_SERVE_DELAY: float = 1.0  # Sec before the ball is served again after a point
 
 PADDLE_SPEED: int = 6
 PADDLE_WIDTH: int = 8
@@ -20,8 +21,52 @@ PADDLE_HEIGHT: int = 64
 
 POINTS_TO_WIN: int = 10
 
-FPS: int = 60
+FPS: int = 60  # Rate the per frame speeds above are tuned for
+
+TICK_RATE: int = 120  # Physics steps per second
+TICK_DURATION: float = 1 / TICK_RATE
+TICK_SCALE: float = FPS / TICK_RATE  # Per frame speeds to per step distances
+
+BROADCAST_RATE: int = 30  # Frames sent to the clients per second
+
+FIXED_TIMESTEP: bool = True  # Catch up on late ticks with extra physics steps
+MAX_CATCH_UP_STEPS: int = 5  # Physics steps allowed in a single late tick
+TIMER_WHEEL_SIZE: int = 512  # Slots of the tick timer wheel, about 4 sec at TICK_RATE
+PROFILE_SAMPLE_INTERVAL: int = 64  # Steps and broadcasts between two profiled ones in sampled mode
+
+KEYFRAME_INTERVAL: int = 60  # Full state every N delta frames
+DELTA_HISTORY: int = 120  # Frames kept as possible delta bases
+
+OUTBOX_SIZE: int = 2  # Frames queued per consumer before the oldest is dropped
+
+MAX_PENDING_INPUTS: int = 16  # Inputs queued per player between two ticks before the oldest is dropped
+
+LEASE_TTL: float = 10.0  # Sec before the game of a silent owner can be taken over
+LEASE_RENEW_INTERVAL: float = 3.0  # Sec between two renewals of the game leases
+CHECKPOINT_TTL: int = 3600  # Sec the scores of a game are kept for a failover
+
+FINISHED_GRACE: float = 60.0  # Sec a finished game or tournament is kept in memory
+ABANDON_GRACE: float = 120.0  # Sec without any consumer before a game or tournament is dropped
+EVICTION_INTERVAL: float = 10.0  # Sec between two passes of the eviction
+
+RESULT_BATCH_DELAY: float = 0.05  # Sec the results are gathered before being written together
+RESULT_BATCH_SIZE: int = 100  # Results written in a single transaction
+RESULT_MAX_ATTEMPTS: int = 5  # Writes of a batch before its results are dropped
+RESULT_RETRY_DELAY: float = 0.5  # Sec before the first retry, doubled after each failure
 
 PAUSE_TIMER: float = 30.0  # Pause timer in sec
 
-TOURNAMENT_USERS_NUMBER = 4
\ No newline at end of file
+TOURNAMENT_USERS_NUMBER = 4
+
+RATING_K: float = 24.0  # Largest rating change of a game
+RATING_K_PROVISIONAL: float = 48.0  # Largest rating change while the rating is provisional
+RATING_PROVISIONAL_GAMES: int = 10  # Games before a rating is settled
+
+RATING_WINDOW: float = 50.0  # Rating gap accepted in a match as soon as a user joins
+RATING_WINDOW_GROWTH: float = 10.0  # Rating gap added per sec of wait
+RATING_WINDOW_MAX: float = 400.0  # Largest rating gap accepted in a match, until MATCH_MAX_WAIT
+MATCH_MAX_WAIT: float = 30.0  # Sec of wait after which a user is matched whatever the rating gap
+MATCH_INTERVAL: float = 0.2  # Sec between two matching passes over a queue
+MATCH_SCAN_LIMIT: int = 1000  # Oldest queue entries looked at by a matching pass, Redis is blocked meanwhile
+
+QUEUE_TOMBSTONE_SLACK: int = 64  # Cancelled entries allowed beyond the queued users before a matchmaking queue is rebuilt
\ No newline at end of file
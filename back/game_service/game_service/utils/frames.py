@@ -0,0 +1,68 @@
+import math
+import struct
+
+# Binary game frame, little endian, 40 bytes:
+#   B  frame type (always FRAME_TYPE_STATE)
+#   B  status code, see STATUS_CODES
+#   B  player score
+#   B  opponent score
+#   f  player paddle y
+#   f  opponent paddle y
+#   f  ball x
+#   f  ball y
+#   f  timer (countdown or pause timer), NaN when there is none
+#   d  server time in milliseconds
+#   I  last input sequence of the player applied by the server
+#   I  client tick of that input
+#
+# The positions are already oriented for the receiving player, whose paddle
+# is always on the positive x side, so the paddles x are not sent.
+FRAME_STRUCT = struct.Struct('<BBBBfffffdII')
+
+FRAME_TYPE_STATE = 1
+
+# Compact input sent by the clients, little endian, 11 bytes:
+#   B  frame type (always FRAME_TYPE_INPUT)
+#   B  player, 0 for the sender, 1 for the second player of a local game
+#   B  movement, index in INPUT_MOVEMENTS
+#   I  input sequence
+#   I  client tick
+INPUT_STRUCT = struct.Struct('<BBBII')
+
+FRAME_TYPE_INPUT = 2
+
+INPUT_MOVEMENTS = ('NONE', 'UP', 'DOWN')
+
+STATUS_CODES = {
+	'waiting': 0,
+	'ready': 1,
+	'started': 2,
+	'paused': 3,
+	'finished': 4,
+}
+
+def pack_state(state):
+	''' Pack a state built by Game.get_game_state into a binary frame. '''
+	player = state['player']
+	opponent = state['opponent']
+	ball = state['ball']['position']
+	timer = state.get('timer')
+
+	return FRAME_STRUCT.pack(
+		FRAME_TYPE_STATE,
+		STATUS_CODES[state['status']],
+		player['score'],
+		opponent['score'] if opponent else 0,
+		player['position']['y'],
+		opponent['position']['y'] if opponent else 0,
+		ball['x'],
+		ball['y'],
+		math.nan if timer is None else timer,
+		state.get('time', 0),
+		player.get('input_seq', 0),
+		player.get('input_tick', 0)
+	)
+
+
+def pack_input(player, movement, seq, tick):
+	return INPUT_STRUCT.pack(FRAME_TYPE_INPUT, player, INPUT_MOVEMENTS.index(movement), seq, tick)
@@ -1,51 +1,71 @@
-from .Vector import Vector2
 from .defines import *
 
-def line_rect_collision(start, end, player):
-	# Define the four edges of the player's rectangle
-	rect_left = player.position.x - PADDLE_WIDTH / 2
-	rect_right = player.position.x + PADDLE_WIDTH / 2
-	rect_top = player.position.y - PADDLE_HEIGHT / 2
-	rect_bottom = player.position.y + PADDLE_HEIGHT / 2
-
-	# Ball's current direction
-	direction = end - start
-	direction.normalize()
-
-	# Check for collision with paddle edges
-	intersection = None
-	if intersection := line_intersection(start, end, Vector2(rect_left, rect_top), Vector2(rect_left, rect_bottom)):
-		direction.x *= -1  # Reverse x-direction for left collision
-	elif intersection := line_intersection(start, end, Vector2(rect_right, rect_top), Vector2(rect_right, rect_bottom)):
-		direction.x *= -1  # Reverse x-direction for right collision
-	elif intersection := line_intersection(start, end, Vector2(rect_left, rect_top), Vector2(rect_right, rect_top)):
-		direction.y *= -1  # Reverse y-direction for top collision
-	elif intersection := line_intersection(start, end, Vector2(rect_left, rect_bottom), Vector2(rect_right, rect_bottom)):
-		direction.y *= -1  # Reverse y-direction for bottom collision
-
-	# If collision with top or bottom, adjust y based on intersection position
-	if intersection and (direction.y < 0 or direction.y > 0):
-		# Relative position of the intersection along the paddle's width
-		relative_y = (intersection.y - rect_top) / PADDLE_HEIGHT
-		offset = (relative_y - 0.5) * 2  # Range: -1 to 1
-		direction.y = offset * 0.5  # Adjust y-component based on offset
-		direction.normalize()  # Re-normalize after modification
-
-	return direction if intersection else None  # Return new direction or None if no collision
-
-
-def line_intersection(p1, p2, q1, q2):
-	"""Find the intersection point of two line segments if it exists."""
-	def determinant(a, b, c, d):
-		return a * d - b * c
-
-	denom = determinant(p2.x - p1.x, q1.x - q2.x, p2.y - p1.y, q1.y - q2.y)
-	if denom == 0:
-		return None  # Parallel lines or coincident
-
-	t = determinant(q1.x - p1.x, q1.x - q2.x, q1.y - p1.y, q1.y - q2.y) / denom
-	u = determinant(p2.x - p1.x, q1.x - p1.x, p2.y - p1.y, q1.y - p1.y) / denom
-	if 0 <= t <= 1 and 0 <= u <= 1:
-		# Intersection point
-		return Vector2(p1.x + t * (p2.x - p1.x), p1.y + t * (p2.y - p1.y))
-	return None
\ No newline at end of file
+def swept_circle_rect_collision(position, direction, distance, player):
+	'''
+	Sweep the ball (a circle of BALL_RADIUS) from `position` along
+	`direction` over `distance` against the player's paddle.
+
+	The paddle is grown by the ball radius so the sweep becomes a ray vs
+	AABB (axis-aligned bounding box) test, and the time of impact is
+	computed analytically with the slab method, so a fast ball can not
+	tunnel through the paddle.
+
+	On collision the new ball direction is written in place in `direction`
+	and True is returned, nothing is allocated on the no collision path.
+	'''
+	half_width = PADDLE_WIDTH / 2 + BALL_RADIUS
+	half_height = PADDLE_HEIGHT / 2 + BALL_RADIUS
+
+	delta_x = direction.x * distance
+	delta_y = direction.y * distance
+
+	t_enter = 0.0
+	t_exit = 1.0
+	hit_axis = 'x'  # Face hit when the ball already overlaps the paddle
+
+	# Slab between the left and right faces
+	offset_x = player.position.x - position.x
+	if delta_x == 0:
+		if abs(offset_x) > half_width:
+			return False
+	else:
+		t_near = (offset_x - half_width) / delta_x
+		t_far = (offset_x + half_width) / delta_x
+		if t_near > t_far:
+			t_near, t_far = t_far, t_near
+		if t_near > t_enter:
+			t_enter = t_near
+		if t_far < t_exit:
+			t_exit = t_far
+
+	# Slab between the top and bottom edges
+	offset_y = player.position.y - position.y
+	if delta_y == 0:
+		if abs(offset_y) > half_height:
+			return False
+	else:
+		t_near = (offset_y - half_height) / delta_y
+		t_far = (offset_y + half_height) / delta_y
+		if t_near > t_far:
+			t_near, t_far = t_far, t_near
+		if t_near > t_enter:
+			t_enter = t_near
+			hit_axis = 'y'
+		if t_far < t_exit:
+			t_exit = t_far
+
+	if t_enter > t_exit:
+		return False
+
+	if hit_axis == 'y':
+		# Top or bottom edge of the paddle
+		direction.y = -direction.y
+		return True
+
+	# Front face, bounce with an angle depending on where the paddle was hit
+	hit_y = position.y + delta_y * t_enter
+	relative_y = (hit_y - (player.position.y - PADDLE_HEIGHT / 2)) / PADDLE_HEIGHT
+	offset = min(max((relative_y - 0.5) * 2, -1), 1)  # Range: -1 to 1
+
+	direction.set(-direction.x, offset * 0.5).normalize()
+	return True
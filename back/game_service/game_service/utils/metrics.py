@@ -0,0 +1,20 @@
+import resource
+import sys
+
+def memory_usage():
+	''' Memory gauges of the current process, in bytes. '''
+	usage = resource.getrusage(resource.RUSAGE_SELF)
+
+	# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+	max_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+	try:
+		with open('/proc/self/statm') as statm:
+			rss = int(statm.read().split()[1]) * resource.getpagesize()
+	except OSError:
+		rss = None
+
+	return {
+		'rss': rss,
+		'max_rss': max_rss,
+	}
@@ -0,0 +1,36 @@
+from django.core.cache import cache
+
+from .defines import *
+
+def expected_score(rating, opponent_rating):
+	''' Chance of winning against the opponent, from 0 to 1. '''
+	return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def k_factor(games):
+	return RATING_K_PROVISIONAL if games < RATING_PROVISIONAL_GAMES else RATING_K
+
+
+def rate_game(winner, loser):
+	''' Elo update of the RatingModel rows of the players of a game. '''
+	expected = expected_score(winner.rating, loser.rating)
+
+	winner.rating += k_factor(winner.games) * (1 - expected)
+	loser.rating -= k_factor(loser.games) * (1 - expected)
+
+	winner.games += 1
+	loser.games += 1
+
+
+def rating_key(user_id):
+	return f'user:{user_id}:rating'
+
+
+def cached_rating(user_id):
+	''' Rating of the user kept in the cache, None when not cached. '''
+	return cache.get(rating_key(user_id))
+
+
+def cache_ratings(ratings):
+	''' Cache the ratings, user id -> rating, read by the matchmaking. '''
+	cache.set_many({rating_key(user_id): rating for user_id, rating in ratings.items()}, timeout=None)
@@ -1,4 +1,6 @@
 from .history import GameHistoryView
+from .replay import GameReplayView
 from .stats import GameStatView
 from .game import GameView
-from .tournament import TournamentView
\ No newline at end of file
+from .tournament import TournamentView
+from .metrics import GameMetricsView
\ No newline at end of file
@@ -0,0 +1,43 @@
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+
+from game_service.decorators import async_jwt_view
+from game_service.utils import GameManager, TournamentManager, MatchmakingQueue, Matchmaker
+from game_service.utils.MatchmakingQueue import QUEUE_SIZES
+from game_service.utils.metrics import memory_usage
+
+logger = logging.getLogger(__name__)
+
+def queue_stats():
+	return {queue_type: MatchmakingQueue(queue_type).stats() for queue_type in QUEUE_SIZES}
+
+
+@async_jwt_view
+class GameMetricsView(View):
+	'''
+	Live games and tournaments of the process serving the request, with the
+	frames queued, sent and dropped for their players, its memory usage
+	and the per phase timings of its game loop. The game
+	workers and the other nodes have their own, only the matchmaking
+	queues and their wait times are shared.
+
+	Async so the managers are read on the event loop running the games,
+	between two of their ticks, only the Redis calls go to a thread.
+	'''
+
+	async def get(self, request):
+		matchmaking = await sync_to_async(queue_stats, thread_sensitive=False)()
+
+		data = {
+			'games': GameManager().stats(),
+			'tournaments': TournamentManager().stats(),
+			'memory': memory_usage(),
+			'profile': GameManager().scheduler.profiler.export(),
+			'matchmaking': matchmaking,
+			'matcher': Matchmaker().stats(),
+		}
+
+		return JsonResponse(data, status=200)
@@ -0,0 +1,76 @@
+import logging
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+
+from game_service.models import ReplayModel
+from game_service.decorators import async_jwt_view
+from game_service.utils.Replay import ReplayError
+from game_service.utils.ReplayPlayer import ReplayPlayer
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8192
+
+# Frames rebuilt per step of the stream, in a thread so the event loop keeps
+# serving the games
+CHUNK_FRAMES = 256
+
+
+def next_frames(frames):
+	return ''.join(json.dumps(frame) + '\n' for frame in itertools.islice(frames, CHUNK_FRAMES))
+
+
+async def stream_frames(player):
+	frames = player.frames()
+	while True:
+		chunk = await sync_to_async(next_frames, thread_sensitive=False)(frames)
+		if not chunk:
+			return
+		yield chunk
+
+
+async def stream_chunks(data):
+	for offset in range(0, len(data), CHUNK_SIZE):
+		yield data[offset:offset + CHUNK_SIZE]
+
+
+@async_jwt_view
+class GameReplayView(View):
+	'''
+	Replay of a finished game, as the recorded binary input log, or with
+	?format=frames as the frames rebuilt on the fly, one json per line.
+	Async views with async iterators, as ASGI buffers the sync ones whole.
+	'''
+
+	async def get(self, request, game_id):
+		try:
+			replay = await database_sync_to_async(ReplayModel.objects.get)(game_id=game_id)
+		except ReplayModel.DoesNotExist:
+			return JsonResponse({'error': 'no replay for this game'}, status=404)
+
+		data = bytes(replay.data)
+
+		if request.GET.get('format') == 'frames':
+			try:
+				player = ReplayPlayer(data)
+			except ReplayError as e:
+				logger.error(f'Invalid replay of game {game_id}: {e}')
+				return JsonResponse({'error': 'invalid replay'}, status=400)
+
+			return StreamingHttpResponse(
+				stream_frames(player),
+				content_type='application/x-ndjson'
+			)
+
+		response = StreamingHttpResponse(
+			stream_chunks(data),
+			content_type='application/octet-stream'
+		)
+		response['Content-Length'] = len(data)
+		response['Content-Disposition'] = f'attachment; filename="game-{game_id}.replay"'
+		return response
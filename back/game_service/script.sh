@@ -5,6 +5,13 @@ cd /app
 python3 manage.py makemigrations game_service
 python3 manage.py migrate
 
+# Must be the same for daphne and the workers to agree on the shards
+export GAME_WORKERS=${GAME_WORKERS:-0}
+
+for ((i = 0; i < GAME_WORKERS; i++)); do
+	python3 manage.py runworker game-worker-$i &
+done
+
 daphne -b 0.0.0.0 -p 8000 game_service.asgi:application &
 
 # celery -A game_service.celery worker -Q game_queue --loglevel=info &
@@ -8,3 +8,17 @@ export const BALL_RADIUS = 4 / THREE_RATIO;
 export const CANVAS_WIDTH = 800 / THREE_RATIO;
 export const CANVAS_HEIGHT = 600 / THREE_RATIO;
 
+// Server side coordinates of the player paddle, the opponent is at -PLAYER_X
+export const PLAYER_X = 400 - 20;
+
+// Server side paddle speed (units per ms) and vertical limit, used to
+// predict the player paddle before the server confirms the inputs
+export const PADDLE_SPEED = 6 * 60 / 1000;
+export const PADDLE_MAX_Y = 300 - 64 / 2;
+
+// Frames are rendered this late (ms) to interpolate between two of them
+export const INTERPOLATION_DELAY = 100;
+
+// Game frames encoding asked to the server, 'binary' or 'json' to debug
+export const GAME_PROTOCOL = 'binary';
+
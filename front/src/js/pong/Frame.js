@@ -0,0 +1,65 @@
+import { PLAYER_X } from "./Defines.js"
+
+// Must match FRAME_STRUCT in game_service/utils/frames.py
+const FRAME_TYPE_STATE = 1
+const FRAME_SIZE = 40
+
+const STATUSES = ['waiting', 'ready', 'started', 'paused', 'finished']
+
+// Must match INPUT_STRUCT in game_service/utils/frames.py
+const FRAME_TYPE_INPUT = 2
+const INPUT_SIZE = 11
+
+const MOVEMENTS = ['NONE', 'UP', 'DOWN']
+
+// Encode a paddle input, player is 0 for the user and 1 for the second
+// player of a local game
+export function encodeInput(player, movement, seq, tick) {
+	const buffer = new ArrayBuffer(INPUT_SIZE)
+	const view = new DataView(buffer)
+
+	view.setUint8(0, FRAME_TYPE_INPUT)
+	view.setUint8(1, player)
+	view.setUint8(2, MOVEMENTS.indexOf(movement))
+	view.setUint32(3, seq, true)
+	view.setUint32(7, tick, true)
+
+	return buffer
+}
+
+// Decode a binary game frame into the same shape as the json frames
+export function decodeFrame(buffer) {
+	if (buffer.byteLength < FRAME_SIZE)
+		return null
+
+	const view = new DataView(buffer)
+	if (view.getUint8(0) !== FRAME_TYPE_STATE)
+		return null
+
+	const data = {
+		status: STATUSES[view.getUint8(1)],
+		player: {
+			score: view.getUint8(2),
+			input_seq: view.getUint32(32, true),
+			input_tick: view.getUint32(36, true),
+			position: { x: PLAYER_X, y: view.getFloat32(4, true) }
+		},
+		opponent: {
+			score: view.getUint8(3),
+			position: { x: -PLAYER_X, y: view.getFloat32(8, true) }
+		},
+		ball: {
+			position: { x: view.getFloat32(12, true), y: view.getFloat32(16, true) }
+		}
+	}
+
+	const timer = view.getFloat32(20, true)
+	if (!Number.isNaN(timer))
+		data.timer = timer
+
+	const time = view.getFloat64(24, true)
+	if (time !== 0)
+		data.time = time
+
+	return data
+}
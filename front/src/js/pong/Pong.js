@@ -12,6 +12,8 @@ import { Timer } from './Timer.js'
 import { Platform } from './Platform.js'
 import { Stadium } from './Stadium.js'
 import { WSManager } from '../utils/WebSocketManager.js'
+import { decodeFrame, encodeInput } from './Frame.js'
+import { GAME_PROTOCOL, INTERPOLATION_DELAY, PADDLE_SPEED, PADDLE_MAX_Y } from './Defines.js'
 
 // maybe show the game on socket open
 export class Pong {
@@ -59,6 +61,18 @@ export class Pong {
 
 		this.requestId = null
 
+		// Frames received from the server, rendered with some delay and
+		// interpolated as they are sent less often than the screen refresh
+		this.snapshots = []
+		this.clockOffset = null
+
+		// Inputs are numbered per user, the own paddle is predicted from the
+		// last server state and the inputs the server has not applied yet
+		this.tick = 0
+		this.inputSeqs = {}
+		this.pendingInputs = []
+		this.serverPlayer = null
+
 		this.connectGameWebSocket()
 	}
 
@@ -141,12 +155,15 @@ export class Pong {
 
 		const socket = new WebSocket(url)
 		if (!socket) return
+
+		socket.binaryType = 'arraybuffer'
 			
 		WSManager.add('game', socket)
 
 		socket.onopen = () => {
 			WSManager.send('game', {
 				type: 'ready',
+				protocol: GAME_PROTOCOL,
 			})
 		
 			if (this.gameID) {
@@ -157,8 +174,9 @@ export class Pong {
 		}
 		
 		socket.onmessage = (e) => {
-			const data = JSON.parse(e.data)
-			this.updateGame(data)
+			const data = e.data instanceof ArrayBuffer ? decodeFrame(e.data) : JSON.parse(e.data)
+			if (data)
+				this.updateGame(data)
 		}
 
 		socket.onerror = async (e) => {
@@ -230,9 +248,7 @@ export class Pong {
 			const pauseDiv = document.getElementById("game-pause")
 			pauseDiv.hidden = true
 
-			this.player.setPosition(data.player.position.x, data.player.position.y)
-			this.opponent.setPosition(data.opponent.position.x, data.opponent.position.y)
-			this.ball.setPosition(data.ball.position.x, data.ball.position.y)
+			this.pushSnapshot(data)
 			this.displayScore(data)
 			
 		} else if (data && data.status === 'finished') {
@@ -254,7 +270,95 @@ export class Pong {
 		}
 	}
 	
+	pushSnapshot(data) {
+		if (data.time === undefined) {
+			this.player.setPosition(data.player.position.x, data.player.position.y)
+			this.opponent.setPosition(data.opponent.position.x, data.opponent.position.y)
+			this.ball.setPosition(data.ball.position.x, data.ball.position.y)
+			return
+		}
+
+		// Smallest difference seen between the local and the server clocks
+		const offset = performance.now() - data.time
+		if (this.clockOffset === null || offset < this.clockOffset)
+			this.clockOffset = offset
+
+		this.snapshots.push({
+			time: data.time,
+			player: data.player.position,
+			opponent: data.opponent.position,
+			ball: data.ball.position
+		})
+
+		this.reconcile(data)
+	}
+
+	reconcile(data) {
+		if (data.player.input_seq === undefined)
+			return
+
+		let movement = this.serverPlayer ? this.serverPlayer.movement : 'NONE'
+		while (this.pendingInputs.length > 0 && this.pendingInputs[0].seq <= data.player.input_seq)
+			movement = this.pendingInputs.shift().movement
+
+		this.serverPlayer = {
+			time: data.time,
+			y: data.player.position.y,
+			movement: movement
+		}
+	}
+
+	predictPlayer() {
+		const server = this.serverPlayer
+		let time = server.time + this.clockOffset
+		let y = server.y
+		let movement = server.movement
+
+		// Replay the inputs sent since the last server state
+		for (const input of this.pendingInputs) {
+			if (input.time > time) {
+				y = movePaddle(y, movement, input.time - time)
+				time = input.time
+			}
+			movement = input.movement
+		}
+
+		return movePaddle(y, movement, performance.now() - time)
+	}
+
+	interpolate() {
+		const snapshots = this.snapshots
+		if (snapshots.length === 0)
+			return
+
+		const renderTime = performance.now() - this.clockOffset - INTERPOLATION_DELAY
+
+		// Forget the frames older than the two surrounding the render time
+		while (snapshots.length > 2 && snapshots[1].time <= renderTime)
+			snapshots.shift()
+
+		const from = snapshots[0]
+		const to = snapshots.length > 1 ? snapshots[1] : from
+		const span = to.time - from.time
+		const t = span > 0 ? Math.min(Math.max((renderTime - from.time) / span, 0), 1) : 1
+
+		if (this.serverPlayer)
+			this.player.setPosition(to.player.x, this.predictPlayer())
+		else
+			this.player.setPosition(lerp(from.player.x, to.player.x, t), lerp(from.player.y, to.player.y, t))
+		this.opponent.setPosition(lerp(from.opponent.x, to.opponent.x, t), lerp(from.opponent.y, to.opponent.y, t))
+
+		// The ball jumps back to the center after a point, do not slide it
+		const jump = Math.abs(to.ball.x - from.ball.x) > 200
+		this.ball.setPosition(
+			jump ? to.ball.x : lerp(from.ball.x, to.ball.x, t),
+			jump ? to.ball.y : lerp(from.ball.y, to.ball.y, t)
+		)
+	}
+
 	displayGame() {
+		this.tick++
+		this.interpolate()
 		this.renderer.update()
 		this.requestId = window.requestAnimationFrame(this.displayGame.bind(this))
 	}
@@ -324,9 +428,24 @@ export class Pong {
 
 
 	updatePlayer(user_id, movement) {
+		const seq = (this.inputSeqs[user_id] || 0) + 1
+		this.inputSeqs[user_id] = seq
+
+		if (user_id === Session.getUserID())
+			this.pendingInputs.push({ seq: seq, time: performance.now(), movement: movement })
+
+		const socket = WSManager.get('game')
+		if (GAME_PROTOCOL === 'binary' && socket && socket.readyState === WebSocket.OPEN) {
+			const player = user_id === Session.getUserID() ? 0 : 1
+			socket.send(encodeInput(player, movement, seq, this.tick))
+			return
+		}
+
 		WSManager.send('game', {
-			'type': 'update',
+			'type': 'input',
 			'user_id': user_id,
+			'seq': seq,
+			'tick': this.tick,
 			'movement': movement
 		})
 	}
@@ -350,3 +469,15 @@ export class Pong {
 	}
 
 }
+
+function lerp(from, to, t) {
+	return from + (to - from) * t
+}
+
+function movePaddle(y, movement, duration) {
+	if (movement === 'UP')
+		y -= PADDLE_SPEED * duration
+	else if (movement === 'DOWN')
+		y += PADDLE_SPEED * duration
+	return Math.min(Math.max(y, -PADDLE_MAX_Y), PADDLE_MAX_Y)
+}